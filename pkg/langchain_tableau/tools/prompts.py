@@ -1,3 +1,6 @@
+import json
+from types import MappingProxyType
+
 vds_schema = {
     "FieldBase": {
         "type": "object",
@@ -1054,44 +1057,52 @@ error_queries = [
     }
 ]
 
-vds_prompt_data = {
+def compact_json(value) -> str:
+    return json.dumps(value, separators=(',', ':'))
+
+
+# static prompt sections are serialized once instead of being repr-ed into every prompt,
+# vds_schema is applied to the query writing template as a partial variable
+vds_schema_json = compact_json(vds_schema)
+sample_queries_json = compact_json(sample_queries)
+error_queries_json = compact_json(error_queries)
+
+# shared by every tool call and never modified, each request layers its own inputs over it
+vds_prompt_data = MappingProxyType({
     "task": {},
     "meta": {},
     "data_dictionary": {},
     "data_model": {},
-    "vds_schema": vds_schema,
-    "sample_queries": sample_queries,
-    "error_queries": error_queries,
+    "sample_queries": sample_queries_json,
+    "error_queries": error_queries_json,
     "previous_call_error": {},
     "previous_vds_payload": {}
-}
+})
 
-vds_query = """
-Task:
+# sections of the query writing prompt, shared by both layouts which only differ in their order
+_vds_query_intro = """Task:
 Your job is to write the main body of a request to the Tableau VizQL Data Service (VDS) API to
-obtain data that answers the task given to you by the user:
-
-User Task: {task}
+obtain data that answers the task given to you by the user"""
 
-Data Dictionary:
+_vds_query_data_dictionary = """Data Dictionary:
 Use this to map the user's natural language questions to the fields of data available in the data source and
 to be aware of any additional operations that may be needed to conceptualize the data correctly according to business
 semantics or other logic such as applying filters, aggregations, dates, etc.
 
-{data_dictionary}
+{data_dictionary}"""
 
-Data Model:
+_vds_query_data_model = """Data Model:
 Provides sample values for fields in the data source. This is useful in particular when aggregating or inferring
 filter values.
 
-{data_model}
+{data_model}"""
 
-VDS Schema:
+_vds_query_schema = """VDS Schema:
 OpenAPI schema describing JSON payloads to the VDS API, use this to generate queries with correct syntax.
 
-{vds_schema}
+{vds_schema}"""
 
-Query:
+_vds_query_instructions = """Query:
 The query must be written according to the `vds_schema.Query` key. Which describes two properties: fields (required)
 and filters (optional)l.
 
@@ -1150,9 +1161,9 @@ in order to obtain data in different shapes.
 Error Queries:
 These examples demonstrate common errors you have generated in the past, avoid these scenarios by using correct syntax instead
 
-{error_queries}
+{error_queries}"""
 
-Previous Tool Call Errors:
+_vds_query_previous_errors = """Previous Tool Call Errors:
 If this section has data, then the previous attempt resulted in an error described here:
 
 {previous_call_error}
@@ -1161,13 +1172,44 @@ If the array was empty without syntax errors this indicates that a filter was ap
 
 The query you generated that caused the error is this:
 
-{previous_vds_payload}
+{previous_vds_payload}"""
 
-Output:
+_vds_query_output = """Output:
 Your output must be minimal, containing only the VDS query in JSON format without any extra formatting for readability.
 If the data source does not contain fields of data that can answer the user_input, return a message so the agent knows to
-use a different tool.
-"""
+use a different tool."""
+
+_vds_query_task = "User Task: {task}"
+
+
+def _prompt(*sections: str) -> str:
+    return "\n" + "\n\n".join(sections) + "\n"
+
+
+vds_query = _prompt(
+    _vds_query_intro + ":",
+    _vds_query_task,
+    _vds_query_data_dictionary,
+    _vds_query_data_model,
+    _vds_query_schema,
+    _vds_query_instructions,
+    _vds_query_previous_errors,
+    _vds_query_output
+)
+
+# same instructions as `vds_query` ordered from static to dynamic content: schema, instructions and examples are
+# shared by every request, the data dictionary and model by every question on a data source and the task comes last.
+# Providers that cache prompt prefixes can then reuse everything before the task across requests
+vds_query_cache_optimized = _prompt(
+    _vds_query_intro + " at the end of these instructions.",
+    _vds_query_schema,
+    _vds_query_instructions,
+    _vds_query_output,
+    _vds_query_data_dictionary,
+    _vds_query_data_model,
+    _vds_query_previous_errors,
+    _vds_query_task
+)
 
 vds_response = """
 This is the output of a data query tool used to fetch information via Tableau's VizQL API
@@ -1,20 +1,68 @@
-from typing import Optional
+from typing import Annotated, Any, Awaitable, Callable, List, Mapping, NotRequired, Optional, Union
 from pydantic import BaseModel, Field
 
 from langchain.prompts import PromptTemplate
-from langchain_core.tools import tool, ToolException
-
-from langchain_tableau.tools.prompts import vds_query, vds_prompt_data, vds_response
-from langchain_tableau.utilities.auth import jwt_connected_app
-from langchain_tableau.utilities.models import select_model
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.prompt_values import PromptValue
+from langchain_core.runnables import RunnableLambda
+from langchain_core.tools import StructuredTool, ToolException
+from langgraph.config import get_stream_writer
+from langgraph.prebuilt import InjectedState
+from langgraph.prebuilt.chat_agent_executor import AgentState
+
+from langchain_tableau.tools.prompts import (
+    vds_query,
+    vds_query_cache_optimized,
+    vds_prompt_data,
+    vds_response,
+    vds_schema,
+    vds_schema_json,
+    sample_queries,
+    error_queries
+)
+from langchain_tableau.tools.vds_models import VDSQuery, structured_query_message
+from langchain_tableau.utilities.auth import is_unauthorized, tableau_session_cache
+from langchain_tableau.utilities.models import PromptCacheStats, select_model
+from langchain_tableau.utilities.cache import SemanticQueryCache, VDSResponseCache
+from langchain_tableau.utilities.relevance import FieldRanker, default_field_ranker
+from langchain_tableau.utilities.few_shot import QueryExampleSelector
+from langchain_tableau.utilities.vds_validation import VDSQueryValidator
+from langchain_tableau.utilities.datasource_registry import DatasourceRegistry, datasource_registry
 from langchain_tableau.utilities.simple_datasource_qa import (
     env_vars_simple_datasource_qa,
+    get_datasource_metadata,
     augment_datasource_metadata,
+    augment_datasource_metadata_async,
+    layer_prompt_inputs,
     get_headlessbi_data,
+    get_headlessbi_data_async,
     prepare_prompt_inputs
 )
 
 
+# compiled once from the VDS schema and shared by every tool instance
+vds_query_validator = VDSQueryValidator(vds_schema)
+
+
+def message_text(message: BaseMessage) -> str:
+    """The text of a message, whose content some providers such as Anthropic stream as a list of content blocks"""
+    if isinstance(message.content, str):
+        return message.content
+    return "".join(
+        block if isinstance(block, str) else block.get("text", "")
+        for block in message.content
+        if isinstance(block, str) or block.get("type") == "text"
+    )
+
+
+def stream_writer() -> Callable[[Any], None]:
+    """Returns the LangGraph custom stream writer, or a no-op when the tool runs outside of a graph"""
+    try:
+        return get_stream_writer()
+    except RuntimeError:
+        return lambda chunk: None
+
+
 class DataSourceQAInputs(BaseModel):
     """Describes inputs for usage of the simple_datasource_qa tool"""
 
@@ -52,6 +100,33 @@ class DataSourceQAInputs(BaseModel):
     )
 
 
+class MultiDataSourceQAInputs(DataSourceQAInputs):
+    """Inputs of the simple_datasource_qa tool when it may query several data sources"""
+
+    datasource_luid: Optional[str] = Field(
+        None,
+        description="""The LUID of the Tableau data source to query when more than one is available, otherwise use None
+        to query the data source of the conversation""",
+        examples=[
+            None, # the conversation's data source
+            "b7c36ea4-9a2c-4bc0-8b58-1bfb1b6e6a63"
+        ],
+    )
+    # graph state injected by LangGraph's ToolNode, its "datasource" selects the data source of the conversation
+    state: Annotated[Optional[dict], InjectedState] = None
+
+
+class DataSourceQAState(AgentState):
+    """
+    Agent state carrying the data source of the conversation, as sent by clients in "datasource".
+
+    `create_react_agent` only keeps the keys of its state schema, so agents must be created with
+    `state_schema=DataSourceQAState` for a tool created with `datasource_luids` to read it.
+    """
+
+    datasource: NotRequired[dict]
+
+
 def initialize_simple_datasource_qa(
     domain: Optional[str] = None,
     site: Optional[str] = None,
@@ -62,7 +137,26 @@ def initialize_simple_datasource_qa(
     tableau_user: Optional[str] = None,
     datasource_luid: Optional[str] = None,
     model_provider: Optional[str] = None,
-    tooling_llm_model: Optional[str] = None
+    tooling_llm_model: Optional[str] = None,
+    revalidate_metadata: bool = False,
+    query_cache: Optional[SemanticQueryCache] = None,
+    response_cache: Optional[VDSResponseCache] = None,
+    max_table_rows: Optional[int] = None,
+    max_table_chars: Optional[int] = None,
+    data_token_budget: Optional[int] = None,
+    max_prompt_fields: Optional[int] = None,
+    field_ranker: Optional[FieldRanker] = None,
+    max_examples: Optional[int] = None,
+    example_selector: Optional[QueryExampleSelector] = None,
+    prompt_layout: str = "task_first",
+    prompt_cache_stats: Optional[PromptCacheStats] = None,
+    validate_queries: bool = True,
+    max_repair_attempts: int = 1,
+    structured_output: bool = False,
+    stream_response: bool = False,
+    datasource_luids: Optional[List[str]] = None,
+    registry: Optional[DatasourceRegistry] = None,
+    field_value_samples: Optional[int] = None
 ):
     """
     Initializes the Langgraph tool called 'simple_datasource_qa' for analytical
@@ -78,20 +172,76 @@ def initialize_simple_datasource_qa(
         tableau_user (Optional[str]): The Tableau user to authenticate as.
         datasource_luid (Optional[str]): The LUID of the data source to perform QA on.
         tooling_llm_model (Optional[str]): The LLM model to use for tooling operations.
+        revalidate_metadata (bool): Check the data source's last update and extract refresh times before
+            reusing cached metadata between tool calls. Always done when a `response_cache` is set.
+        query_cache (Optional[SemanticQueryCache]): Reuses VDS queries previously written for the same or
+            similar questions on the data source, skipping the query-writing LLM call on a hit.
+        response_cache (Optional[VDSResponseCache]): Serves identical VDS queries by the same user from a cache
+            until the data source is republished or its extract is refreshed. Each call checks the data source's
+            freshness with a small Metadata API query so refreshed extracts are never answered from the cache.
+        max_table_rows (Optional[int]): Maximum number of result rows included in the tool response.
+        max_table_chars (Optional[int]): Maximum size in characters of the result table in the tool response.
+        data_token_budget (Optional[int]): Approximate token budget for query results in the tool response. Larger
+            results are replaced by column statistics and the top rows by the sorted measure, `max_table_rows` and
+            `max_table_chars` still limit the rows shown.
+        max_prompt_fields (Optional[int]): Limits the fields described to the query-writing model to the ones most
+            relevant to the question, plus date fields. Recommended for data sources with hundreds of fields.
+        field_ranker (Optional[FieldRanker]): Ranks fields when `max_prompt_fields` is set, pass one with an
+            embedding model to combine semantic similarity with the default lexical ranking.
+        max_examples (Optional[int]): Limits the sample queries in the query-writing prompt to the ones most relevant
+            to the question, along with related error queries. None includes every example.
+        example_selector (Optional[QueryExampleSelector]): Selects examples when `max_examples` is set, pass one with
+            an embedding model to rank examples by similarity as well as by the filters the question needs.
+        prompt_layout (str): "task_first" or "cache_optimized". The cache optimized layout places the static schema,
+            instructions and examples first, then the data source's dictionary and model and the question last so
+            that providers caching prompt prefixes can reuse most of the prompt between calls. Prefixes are longest
+            when `max_examples` and `max_prompt_fields` are not set, since those vary with each question.
+        prompt_cache_stats (Optional[PromptCacheStats]): Accumulates prompt tokens and provider cache hits reported
+            by the query-writing model. Available as `tool.metadata["prompt_cache_stats"]`.
+        validate_queries (bool): Check written queries against the VDS schema and the data source's fields before
+            sending them, so malformed queries fail fast with an error describing how to correct them.
+        max_repair_attempts (int): Number of times a query rejected by validation or VDS, or returning no data, is
+            rewritten with the error inside the same tool call before the error is returned to the agent.
+        structured_output (bool): Bind the VDS query model to the query writer with tool calling so queries are
+            returned as structured arguments instead of free text JSON. Requires a model that supports tool calling.
+        stream_response (bool): Emit progress as LangGraph custom stream events ("query_written", "rows_received")
+            and have the tool write the answer itself, streaming it as "summary_token" events, rather than returning
+            a prompt for the agent to summarize. Events are read with `graph.stream(..., stream_mode="custom")`.
+            In this mode the tool returns the finished answer as a string instead of the `vds_response` prompt.
+        datasource_luids (Optional[List[str]]): Data sources the tool may query besides `datasource_luid`, selected
+            per call with the `datasource_luid` argument or the graph state's "datasource", which is only kept by
+            agents created with `state_schema=DataSourceQAState`. They are loaded in the background when the tool
+            is created. None binds the tool to `datasource_luid` and does not expose the argument to the agent.
+        registry (Optional[DatasourceRegistry]): Holds compiled prompt sections and usage of each data source, shared
+            by every tool by default. Available as `tool.metadata["datasource_registry"]`. When `datasource_luids` is
+            set, the most queried data sources are reloaded in the background until
+            `tool.metadata["stop_datasource_warming"]()` is called.
+        field_value_samples (Optional[int]): Shows the query-writing model this many of the most frequent members of
+            each STRING field, helping it write SET and MATCH filters with values that exist. Members are sampled
+            with a few small VDS queries per data source and cached per user until the data source changes.
 
     Returns:
-        function: A decorated function that can be used as a langgraph tool for data source QA.
+        StructuredTool: A langgraph tool for data source QA with sync and async (`ainvoke`) implementations.
 
     The returned function (datasource_qa) takes the following parameters:
         user_input (str): The user's query or command represented in simple SQL.
         previous_call_error (Optional[str]): Any error from a previous call, for error handling.
+        datasource_luid (Optional[str]): When `datasource_luids` is set, the data source to query, defaults to the
+            graph state's "datasource" and then to the tool's `datasource_luid`.
 
-    It returns a dictionary containing the results of the QA operation.
+    It returns the `vds_response` prompt with the query results for the agent to answer from, or the answer
+    written by the tool as a string when `stream_response` is set.
 
     Note:
         If arguments are not provided, the function will attempt to read them from
         environment variables, typically stored in a .env file.
     """
+    if prompt_layout not in ("task_first", "cache_optimized"):
+        raise ValueError(f"Unsupported prompt layout: {prompt_layout}")
+
+    if prompt_cache_stats is None:
+        prompt_cache_stats = PromptCacheStats()
+
     # if arguments are not provided, the tool obtains environment variables directly from .env
     env_vars = env_vars_simple_datasource_qa(
         domain=domain,
@@ -103,15 +253,331 @@ def initialize_simple_datasource_qa(
         tableau_user=tableau_user,
         datasource_luid=datasource_luid,
         model_provider=model_provider,
-        tooling_llm_model=tooling_llm_model
+        tooling_llm_model=tooling_llm_model,
+        datasource_luids=datasource_luids
+    )
+
+    # Session scopes are limited to only required authorizations to Tableau resources that support tool operations
+    access_scopes = [
+        "tableau:content:read", # for quering Tableau Metadata API
+        "tableau:viz_data_service:read" # for querying VizQL Data Service
+    ]
+
+    session_args = {
+        "tableau_domain": env_vars["domain"],
+        "tableau_site": env_vars["site"],
+        "jwt_client_id": env_vars["jwt_client_id"],
+        "jwt_secret_id": env_vars["jwt_secret_id"],
+        "jwt_secret": env_vars["jwt_secret"],
+        "tableau_api": env_vars["tableau_api_version"],
+        "tableau_user": env_vars["tableau_user"],
+        "scopes": access_scopes
+    }
+
+    if field_ranker is None:
+        field_ranker = default_field_ranker
+    if example_selector is None:
+        example_selector = QueryExampleSelector(sample_queries=sample_queries, error_queries=error_queries)
+    if registry is None:
+        registry = datasource_registry
+
+    # Default data source for VDS querying, and the others a call may select
+    default_datasource = env_vars["datasource_luid"]
+    allowed_datasources = None
+    if datasource_luids is not None:
+        allowed_datasources = list(dict.fromkeys([luid for luid in [default_datasource, *datasource_luids] if luid]))
+
+    # cached metadata and VDS responses are only shared by the same user on the same site due to row-level security
+    user_scope = f'{env_vars["domain"]}|{env_vars["site"]}|{env_vars["tableau_user"]}'
+
+    def load_datasource(luid: str) -> dict:
+        tableau_session = tableau_session_cache.get_session(**session_args)
+        return get_datasource_metadata(
+            api_key=tableau_session['credentials']['token'],
+            url=env_vars["domain"],
+            datasource_luid=luid,
+            user_scope=user_scope
+        )
+
+    if allowed_datasources:
+        # the first question about each data source does not wait on its metadata
+        registry.warm(allowed_datasources, load_datasource)
+
+    # the most queried of them are loaded again in the background until stopped
+    stop_warming = registry.keep_warm(allowed_datasources, load_datasource) if allowed_datasources else lambda: None
+
+    def resolve_datasource(datasource_luid: Optional[str], state: Optional[dict]) -> str:
+        if allowed_datasources is None:
+            # a single data source tool only ever queries its configured data source
+            return default_datasource
+        # an explicit argument wins over the conversation's data source, which wins over the tool's default
+        conversation_datasource = (state or {}).get('datasource')
+        if isinstance(conversation_datasource, dict):
+            conversation_datasource = conversation_datasource.get('luid')
+        luid = datasource_luid or conversation_datasource or default_datasource
+        if not luid:
+            raise ToolException(
+                "No data source was selected. Provide the datasource_luid of the Tableau data source to query."
+            )
+        if luid not in allowed_datasources:
+            raise ToolException(
+                f"Data source {luid} is not available to this tool. Available data sources: {', '.join(allowed_datasources)}"
+            )
+        return luid
+
+    # cached responses are tied to the data source version, which is only current when metadata is revalidated
+    revalidate_metadata = revalidate_metadata or response_cache is not None
+
+    def authentication_error(e: Exception) -> ToolException:
+        auth_error_string = f"""
+        CRITICAL ERROR: Could not authenticate to the Tableau site successfully.
+        This tool is unusable as a result.
+        Error from remote server: {e}
+
+        INSTRUCTION: Do not ask the user to provide credentials directly or in chat since they should
+        originate from a secure Connected App or similar authentication mechanism. You may inform the
+        user that you are not able to access their Tableau environment at this time. You can also describe
+        the nature of the error to help them understand why you can't service their request.
+        """
+        return ToolException(auth_error_string)
+
+    def query_error(vds_query, user_input: str, e: Exception) -> ToolException:
+        query_error_message = f"""
+        Tableau's VizQL Data Service return an error for the generated query:
+
+        {str(vds_query.content)}
+
+        The user_input used to write this query was:
+
+        {str(user_input)}
+
+        This was the error:
+
+        {str(e)}
+
+        Consider retrying this tool with the same inputs but include the previous query
+        causing the error and the error itself for the tool to correct itself on a retry.
+        If the error was an empty array, this usually indicates an incorrect filter value
+        was applied, thus returning no data
+        """
+        return ToolException(query_error_message)
+
+    # prompts, model client and chain are built once per tool instance and reused by every call
+    # 1. Insert instruction data into the template
+    query_writing_prompt = PromptTemplate(
+        input_variables=[
+            "task",
+            "vds_schema",
+            "sample_queries",
+            "error_queries",
+            "data_dictionary",
+            "data_model",
+            "previous_call_error",
+            "previous_vds_payload"
+        ],
+        template=vds_query_cache_optimized if prompt_layout == "cache_optimized" else vds_query
+    ).partial(vds_schema=vds_schema_json)
+
+    # 2. Instantiate language model to execute the prompt to write a VizQL Data Service query
+    query_writer = select_model(
+        provider=env_vars["model_provider"],
+        model_name=env_vars["tooling_llm_model"],
+        temperature=0
+    )
+
+    if structured_output:
+        # the model fills in the arguments of a VDSQuery tool call, which is serialized back into a JSON payload
+        query_writing_chain = (
+            query_writing_prompt
+            | query_writer.with_structured_output(VDSQuery, method="function_calling", include_raw=True)
+            | RunnableLambda(structured_query_message)
+        )
+    else:
+        query_writing_chain = query_writing_prompt | query_writer
+
+    def repairable(e: Exception) -> bool:
+        # rejected or empty queries can be rewritten, authorization and server errors would fail again
+        return isinstance(e, ValueError) or "Status code: 400" in str(e)
+
+    def repair_inputs(query_writing_data: Mapping[str, Any], vds_query, e: Exception) -> Mapping[str, Any]:
+        return layer_prompt_inputs(query_writing_data, {
+            "previous_call_error": str(e),
+            "previous_vds_payload": vds_query.content
+        })
+
+    # answers are written with the tooling model when the tool streams its own response
+    response_writer = select_model(
+        provider=env_vars["model_provider"],
+        model_name=env_vars["tooling_llm_model"]
+    ) if stream_response else None
+
+    def progress_event(event: str, **data) -> dict:
+        return {"tool": "simple_datasource_qa", "event": event, **data}
+
+    # 4. Prepare inputs for a structured response to the calling Agent
+    def response_inputs(query_writing_data: Mapping[str, Any], result: dict, user_input: str) -> dict:
+        metadata = query_writing_data.get('meta')
+        data = {
+            "query": result.get('vds_query', ''),
+            "data_source_name": metadata.get('datasource_name'),
+            "data_source_description": metadata.get('datasource_description'),
+            "data_source_maintainer": metadata.get('datasource_owner'),
+            "data_table": result.get('data_table', ''),
+        }
+        inputs = prepare_prompt_inputs(data=data, user_string=user_input)
+        return inputs
+
+    # 5. Response template for the Agent with further instructions
+    response_prompt = PromptTemplate(
+        input_variables=[
+            "data_source_name",
+            "data_source_description",
+            "data_source_maintainer",
+            "vds_query",
+            "data_table",
+            "user_input"
+        ],
+        template=vds_response
     )
 
-    @tool("simple_datasource_qa", args_schema=DataSourceQAInputs)
+    def session_token() -> str:
+        try:
+            # sessions are reused across tool calls until shortly before they expire
+            tableau_session = tableau_session_cache.get_session(**session_args)
+        except Exception as e:
+            raise authentication_error(e)
+        # credentials to access Tableau environment on behalf of the user
+        return tableau_session['credentials']['token']
+
+    async def asession_token() -> str:
+        try:
+            tableau_session = await tableau_session_cache.aget_session(**session_args)
+        except Exception as e:
+            raise authentication_error(e)
+        return tableau_session['credentials']['token']
+
+    def rejected_session(api_key: str) -> None:
+        # the server rejected the cached token before its expected expiry, such as a revoked session
+        tableau_session_cache.invalidate(
+            tableau_domain=session_args["tableau_domain"],
+            tableau_site=session_args["tableau_site"],
+            tableau_user=session_args["tableau_user"],
+            scopes=session_args["scopes"],
+            api_key=api_key
+        )
+
+    def authorized(request: Callable[[str], Any]) -> Any:
+        """Sends a request with the cached session, signing in again and retrying once if its token is rejected"""
+        api_key = session_token()
+        try:
+            return request(api_key)
+        except Exception as e:
+            if not is_unauthorized(e):
+                raise
+            rejected_session(api_key)
+        return request(session_token())
+
+    async def aauthorized(request: Callable[[str], Awaitable[Any]]) -> Any:
+        api_key = await asession_token()
+        try:
+            return await request(api_key)
+        except Exception as e:
+            if not is_unauthorized(e):
+                raise
+            rejected_session(api_key)
+        return await request(await asession_token())
+
+    # the sync and async tools share every step below and only differ in how they perform network calls
+    def start_call(
+        user_input: str,
+        previous_call_error: Optional[str],
+        previous_vds_payload: Optional[str],
+        datasource_luid: Optional[str],
+        state: Optional[dict]
+    ) -> dict:
+        tableau_datasource = resolve_datasource(datasource_luid, state)
+        if allowed_datasources is not None:
+            # data sources queried most often are kept warm in the background
+            registry.record_use(tableau_datasource)
+        return {
+            "user_input": user_input,
+            "datasource": tableau_datasource,
+            "writer": stream_writer() if stream_response else lambda chunk: None,
+            # a query written for the same question is reused unless the agent is retrying a failed one
+            "use_query_cache": query_cache is not None and not (previous_call_error or previous_vds_payload),
+            # 0. Obtain metadata about the data source to enhance the query writing prompt
+            "metadata_args": {
+                "task": user_input,
+                "url": env_vars["domain"],
+                "datasource_luid": tableau_datasource,
+                "prompt": vds_prompt_data,
+                "previous_errors": previous_call_error,
+                "previous_vds_payload": previous_vds_payload,
+                "revalidate": revalidate_metadata,
+                "max_fields": max_prompt_fields,
+                "field_ranker": field_ranker,
+                "max_examples": max_examples,
+                "example_selector": example_selector,
+                "registry": registry,
+                "sample_values": field_value_samples,
+                "user_scope": user_scope
+            }
+        }
+
+    def written_query(vds_query) -> AIMessage:
+        prompt_cache_stats.record(vds_query)
+        return vds_query
+
+    def query_args(call: dict, query_writing_data: Mapping[str, Any], vds_query, repair_attempts: int) -> dict:
+        call["writer"](progress_event("query_written", vds_query=vds_query.content, repair_attempt=repair_attempts))
+        # 3. Query data from Tableau's VizQL Data Service using the AI written payload
+        return {
+            "url": env_vars["domain"],
+            "datasource_luid": call["datasource"],
+            "payload": vds_query.content,
+            "cache": response_cache,
+            "user_scope": user_scope,
+            "version": query_writing_data['meta'].get('datasource_version'),
+            "max_rows": max_table_rows,
+            "max_chars": max_table_chars,
+            "token_budget": data_token_budget,
+            "validator": vds_query_validator if validate_queries else None,
+            "data_model": query_writing_data['datasource_fields']
+        }
+
+    def failed_query(
+        call: dict,
+        query_writing_data: Mapping[str, Any],
+        vds_query,
+        e: Exception,
+        repair_attempts: int
+    ) -> Mapping[str, Any]:
+        if repair_attempts >= max_repair_attempts or not repairable(e):
+            raise query_error(vds_query, call["user_input"], e)
+        # the query writer corrects its own query with the session and metadata already at hand
+        return repair_inputs(query_writing_data, vds_query, e)
+
+    def answer_inputs(call: dict, query_writing_data: Mapping[str, Any], vds_query, data) -> dict:
+        if stream_response:
+            call["writer"](progress_event("rows_received", data_table=data))
+        result = {
+            "vds_query": vds_query.content,
+            "data_table": data,
+        }
+        return response_inputs(query_writing_data, result, call["user_input"])
+
+    def summary_token(call: dict, chunk) -> str:
+        token = message_text(chunk)
+        call["writer"](progress_event("summary_token", token=token))
+        return token
+
     def simple_datasource_qa(
         user_input: str,
         previous_call_error: Optional[str] = None,
-        previous_vds_payload: Optional[str] = None
-    ) -> dict:
+        previous_vds_payload: Optional[str] = None,
+        datasource_luid: Optional[str] = None,
+        state: Optional[dict] = None
+    ) -> Union[str, PromptValue]:
         """
         Queries a Tableau data source for analytical Q&A. Returns a data set you can use to answer user questions.
         To be more efficient, describe your entire query in a single request rather than selecting small slices of
@@ -123,147 +589,92 @@ def initialize_simple_datasource_qa(
 
         If you received an error after using this tool, mention it in your next attempt to help the tool correct itself.
         """
+        call = start_call(user_input, previous_call_error, previous_vds_payload, datasource_luid, state)
 
-        # Session scopes are limited to only required authorizations to Tableau resources that support tool operations
-        access_scopes = [
-            "tableau:content:read", # for quering Tableau Metadata API
-            "tableau:viz_data_service:read" # for querying VizQL Data Service
-        ]
-        try:
-            tableau_session = jwt_connected_app(
-                tableau_domain=env_vars["domain"],
-                tableau_site=env_vars["site"],
-                jwt_client_id=env_vars["jwt_client_id"],
-                jwt_secret_id=env_vars["jwt_secret_id"],
-                jwt_secret=env_vars["jwt_secret"],
-                tableau_api=env_vars["tableau_api_version"],
-                tableau_user=env_vars["tableau_user"],
-                scopes=access_scopes
-            )
-        except Exception as e:
-            auth_error_string = f"""
-            CRITICAL ERROR: Could not authenticate to the Tableau site successfully.
-            This tool is unusable as a result.
-            Error from remote server: {e}
-
-            INSTRUCTION: Do not ask the user to provide credentials directly or in chat since they should
-            originate from a secure Connected App or similar authentication mechanism. You may inform the
-            user that you are not able to access their Tableau environment at this time. You can also describe
-            the nature of the error to help them understand why you can't service their request.
-            """
-            raise ToolException(auth_error_string)
-
-        # credentials to access Tableau environment on behalf of the user
-        tableau_auth =  tableau_session['credentials']['token']
-
-        # Data source for VDS querying
-        tableau_datasource = env_vars["datasource_luid"]
-
-        # 0. Obtain metadata about the data source to enhance the query writing prompt
-        query_writing_data = augment_datasource_metadata(
-            task = user_input,
-            api_key = tableau_auth,
-            url = domain,
-            datasource_luid = tableau_datasource,
-            prompt = vds_prompt_data,
-            previous_errors = previous_call_error,
-            previous_vds_payload = previous_vds_payload
-        )
-
-        # 1. Insert instruction data into the template
-        query_writing_prompt = PromptTemplate(
-            input_variables=[
-                "task"
-                "instructions",
-                "vds_schema",
-                "sample_queries",
-                "error_queries",
-                "data_dictionary",
-                "data_model",
-                "previous_call_error",
-                "previous_vds_payload"
-            ],
-            template=vds_query
+        query_writing_data = authorized(
+            lambda api_key: augment_datasource_metadata(api_key=api_key, **call["metadata_args"])
         )
 
-        # 2. Instantiate language model to execute the prompt to write a VizQL Data Service query
-        query_writer = select_model(
-            provider=env_vars["model_provider"],
-            model_name=env_vars["tooling_llm_model"],
-            temperature=0
-        )
+        # 1. & 2. Write a VizQL Data Service query with the language model, unless one already answered this question
+        cached_payload = query_cache.get(call["datasource"], user_input) if call["use_query_cache"] else None
+        if cached_payload is not None:
+            vds_query = AIMessage(content=cached_payload)
+        else:
+            vds_query = written_query(query_writing_chain.invoke(dict(query_writing_data)))
 
-        # 3. Query data from Tableau's VizQL Data Service using the AI written payload
-        def get_data(vds_query):
-            payload = vds_query.content
+        repair_attempts = 0
+        while True:
+            args = query_args(call, query_writing_data, vds_query, repair_attempts)
             try:
-                data = get_headlessbi_data(
-                    api_key = tableau_auth,
-                    url = domain,
-                    datasource_luid = tableau_datasource,
-                    payload = payload
-                )
-
-                return {
-                    "vds_query": payload,
-                    "data_table": data,
-                }
+                data = authorized(lambda api_key: get_headlessbi_data(api_key=api_key, **args))
+                break
             except Exception as e:
-                query_error_message = f"""
-                Tableau's VizQL Data Service return an error for the generated query:
-
-                {str(vds_query.content)}
-
-                The user_input used to write this query was:
-
-                {str(user_input)}
-
-                This was the error:
+                query_writing_data = failed_query(call, query_writing_data, vds_query, e, repair_attempts)
+                repair_attempts += 1
+                cached_payload = None
+                vds_query = written_query(query_writing_chain.invoke(dict(query_writing_data)))
 
-                {str(e)}
+        if query_cache is not None and cached_payload is None:
+            query_cache.set(call["datasource"], user_input, vds_query.content)
 
-                Consider retrying this tool with the same inputs but include the previous query
-                causing the error and the error itself for the tool to correct itself on a retry.
-                If the error was an empty array, this usually indicates an incorrect filter value
-                was applied, thus returning no data
-                """
+        # 4. & 5. Return the structured output, or the answer written by the tool
+        inputs = answer_inputs(call, query_writing_data, vds_query, data)
+        if stream_response:
+            return "".join(summary_token(call, chunk) for chunk in (response_prompt | response_writer).stream(inputs))
+        return response_prompt.invoke(inputs)
 
-                raise ToolException(query_error_message)
+    async def asimple_datasource_qa(
+        user_input: str,
+        previous_call_error: Optional[str] = None,
+        previous_vds_payload: Optional[str] = None,
+        datasource_luid: Optional[str] = None,
+        state: Optional[dict] = None
+    ) -> Union[str, PromptValue]:
+        """
+        Coroutine version of simple_datasource_qa, every network call is awaited so that many
+        conversations can share one event loop without holding worker threads.
+        """
+        call = start_call(user_input, previous_call_error, previous_vds_payload, datasource_luid, state)
 
-        # 4. Prepare inputs for a structured response to the calling Agent
-        def response_inputs(input):
-            metadata = query_writing_data.get('meta')
-            data = {
-                "query": input.get('vds_query', ''),
-                "data_source_name": metadata.get('datasource_name'),
-                "data_source_description": metadata.get('datasource_description'),
-                "data_source_maintainer": metadata.get('datasource_owner'),
-                "data_table": input.get('data_table', ''),
-            }
-            inputs = prepare_prompt_inputs(data=data, user_string=user_input)
-            return inputs
-
-        # 5. Response template for the Agent with further instructions
-        response_prompt = PromptTemplate(
-            input_variables=[
-                "data_source_name",
-                "data_source_description",
-                "data_source_maintainer",
-                "vds_query",
-                "data_table",
-                "user_input"
-            ],
-            template=vds_response
+        query_writing_data = await aauthorized(
+            lambda api_key: augment_datasource_metadata_async(api_key=api_key, **call["metadata_args"])
         )
 
-        # this chain defines the flow of data through the system
-        chain = query_writing_prompt | query_writer | get_data | response_inputs | response_prompt
-
+        cached_payload = await query_cache.aget(call["datasource"], user_input) if call["use_query_cache"] else None
+        if cached_payload is not None:
+            vds_query = AIMessage(content=cached_payload)
+        else:
+            vds_query = written_query(await query_writing_chain.ainvoke(dict(query_writing_data)))
 
-        # invoke the chain to generate a query and obtain data
-        vizql_data = chain.invoke(query_writing_data)
-
-        # Return the structured output
-        return vizql_data
-
-    return simple_datasource_qa
+        repair_attempts = 0
+        while True:
+            args = query_args(call, query_writing_data, vds_query, repair_attempts)
+            try:
+                data = await aauthorized(lambda api_key: get_headlessbi_data_async(api_key=api_key, **args))
+                break
+            except Exception as e:
+                query_writing_data = failed_query(call, query_writing_data, vds_query, e, repair_attempts)
+                repair_attempts += 1
+                cached_payload = None
+                vds_query = written_query(await query_writing_chain.ainvoke(dict(query_writing_data)))
+
+        if query_cache is not None and cached_payload is None:
+            await query_cache.aset(call["datasource"], user_input, vds_query.content)
+
+        inputs = answer_inputs(call, query_writing_data, vds_query, data)
+        if stream_response:
+            return "".join([summary_token(call, chunk) async for chunk in (response_prompt | response_writer).astream(inputs)])
+        return await response_prompt.ainvoke(inputs)
+
+    # the tool runs the coroutine when invoked with `ainvoke`, such as under the LangGraph server
+    return StructuredTool.from_function(
+        func=simple_datasource_qa,
+        coroutine=asimple_datasource_qa,
+        name="simple_datasource_qa",
+        args_schema=DataSourceQAInputs if allowed_datasources is None else MultiDataSourceQAInputs,
+        metadata={
+            "prompt_cache_stats": prompt_cache_stats,
+            "datasource_registry": registry,
+            "stop_datasource_warming": stop_warming
+        }
+    )
@@ -0,0 +1,148 @@
+import json
+from typing import Annotated, Any, Dict, List, Literal, Optional, Union
+from pydantic import BaseModel, Field
+
+from langchain_core.messages import AIMessage
+
+from langchain_tableau.tools.prompts import vds_schema
+
+
+# enumerations and descriptions are taken from the VDS schema so the models stay in step with the prompt
+Function = Literal[tuple(vds_schema["Function"]["enum"])]
+SortDirection = Literal[tuple(vds_schema["SortDirection"]["enum"])]
+QuantitativeFilterType = Literal[
+    tuple(vds_schema["QuantitativeFilterBase"]["allOf"][1]["properties"]["quantitativeFilterType"]["enum"])
+]
+_field_base = vds_schema["FieldBase"]["properties"]
+_relative_date = vds_schema["RelativeDateFilter"]["allOf"][1]["properties"]
+_top_n = vds_schema["TopNFilter"]["allOf"][1]["properties"]
+PeriodType = Literal[tuple(_relative_date["periodType"]["enum"])]
+DateRangeType = Literal[tuple(_relative_date["dateRangeType"]["enum"])]
+
+
+class QueryField(BaseModel):
+    """A column of data in the query: a field of the data source, optionally aggregated, or a calculation"""
+
+    fieldCaption: str = Field(..., description=_field_base["fieldCaption"]["description"])
+    function: Optional[Function] = Field(None, description=vds_schema["Function"]["description"])
+    calculation: Optional[str] = Field(None, description="A Tableau calculation which will be returned as a Field in the Query")
+    fieldAlias: Optional[str] = Field(None, description=_field_base["fieldAlias"]["description"])
+    maxDecimalPlaces: Optional[int] = Field(None, description=_field_base["maxDecimalPlaces"]["description"])
+    sortDirection: Optional[SortDirection] = Field(None, description=vds_schema["SortDirection"]["description"])
+    sortPriority: Optional[int] = Field(None, description=_field_base["sortPriority"]["description"])
+
+
+class FilterField(BaseModel):
+    """The field a filter applies to"""
+
+    fieldCaption: Optional[str] = Field(None, description="The caption of the field to filter on")
+    function: Optional[Function] = Field(None, description=vds_schema["Function"]["description"])
+    calculation: Optional[str] = Field(None, description="A Tableau calculation which will be used to Filter on")
+
+
+class FilterBase(BaseModel):
+    field: FilterField
+    context: Optional[bool] = Field(None, description=vds_schema["Filter"]["properties"]["context"]["description"])
+
+
+class QuantitativeNumericalFilter(FilterBase):
+    """A Filter that can be used to find the minimum, maximum or range of numerical values of a Field"""
+
+    filterType: Literal["QUANTITATIVE_NUMERICAL"]
+    quantitativeFilterType: QuantitativeFilterType
+    min: Optional[Union[int, float]] = Field(None, description="Required if using quantitativeFilterType RANGE or MIN")
+    max: Optional[Union[int, float]] = Field(None, description="Required if using quantitativeFilterType RANGE or MAX")
+    includeNulls: Optional[bool] = None
+
+
+class QuantitativeDateFilter(FilterBase):
+    """A Filter that can be used to find the minimum, maximum or range of date values of a Field"""
+
+    filterType: Literal["QUANTITATIVE_DATE"]
+    quantitativeFilterType: QuantitativeFilterType
+    minDate: Optional[str] = Field(None, description="An RFC 3339 date, required if using quantitativeFilterType RANGE or MIN")
+    maxDate: Optional[str] = Field(None, description="An RFC 3339 date, required if using quantitativeFilterType RANGE or MAX")
+    includeNulls: Optional[bool] = None
+
+
+class SetFilter(FilterBase):
+    """A Filter that can be used to filter on a specific set of values of a Field"""
+
+    filterType: Literal["SET"]
+    values: List[Union[str, int, float, bool]] = Field(..., description="An array of values to filter on")
+    exclude: Optional[bool] = None
+
+
+class MatchFilter(FilterBase):
+    """A Filter that can be used to match against String Fields"""
+
+    filterType: Literal["MATCH"]
+    contains: Optional[str] = Field(None, description="Matches when a Field contains this value")
+    startsWith: Optional[str] = Field(None, description="Matches when a Field starts with this value")
+    endsWith: Optional[str] = Field(None, description="Matches when a Field ends with this value")
+    exclude: Optional[bool] = Field(None, description="When true, the inverse of the matching logic will be used")
+
+
+class RelativeDateFilter(FilterBase):
+    """A Filter for dates relative to an anchor date, such as last week, previous month or current year"""
+
+    filterType: Literal["DATE"]
+    periodType: PeriodType = Field(..., description=_relative_date["periodType"]["description"])
+    dateRangeType: DateRangeType = Field(..., description=_relative_date["dateRangeType"]["description"])
+    rangeN: Optional[int] = Field(None, description=_relative_date["rangeN"]["description"])
+    anchorDate: Optional[str] = Field(None, description=_relative_date["anchorDate"]["description"])
+    includeNulls: Optional[bool] = None
+
+
+class TopNFilter(FilterBase):
+    """A Filter that can be used to find the top or bottom number of Fields relative to the values in the fieldToMeasure"""
+
+    filterType: Literal["TOP"]
+    howMany: int = Field(..., description=_top_n["howMany"]["description"])
+    fieldToMeasure: FilterField
+    direction: Optional[Literal["TOP", "BOTTOM"]] = Field(None, description=_top_n["direction"]["description"])
+
+
+QueryFilter = Annotated[
+    Union[
+        QuantitativeNumericalFilter,
+        QuantitativeDateFilter,
+        SetFilter,
+        MatchFilter,
+        RelativeDateFilter,
+        TopNFilter
+    ],
+    Field(discriminator="filterType")
+]
+
+
+class VDSQuery(BaseModel):
+    """The VizQL Data Service query answering the user task: the fields to query and optional filters"""
+
+    fields: List[QueryField] = Field(..., description=vds_schema["Query"]["properties"]["fields"]["description"])
+    filters: Optional[List[QueryFilter]] = Field(None, description=vds_schema["Query"]["properties"]["filters"]["description"])
+
+    def to_payload(self) -> str:
+        """Serializes the query as the compact JSON body expected by VDS, leaving out unset properties"""
+        return self.model_dump_json(exclude_none=True)
+
+
+def structured_query_message(output: Dict[str, Any]) -> AIMessage:
+    """
+    Turns the output of a model bound to `VDSQuery` with `include_raw=True` into a message holding the JSON
+    payload, keeping the raw message's usage metadata. When the output does not parse into a `VDSQuery`,
+    the raw arguments are passed on so that validation reports what is wrong with them.
+    """
+    raw = output['raw']
+    parsed = output.get('parsed')
+    if parsed is not None:
+        content = parsed.to_payload()
+    elif getattr(raw, 'tool_calls', None):
+        content = json.dumps(raw.tool_calls[0]['args'], separators=(',', ':'))
+    else:
+        content = raw.content
+    return AIMessage(
+        content=content,
+        usage_metadata=raw.usage_metadata,
+        response_metadata=raw.response_metadata
+    )
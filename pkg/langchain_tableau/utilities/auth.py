@@ -1,11 +1,15 @@
 
-from typing import Dict, Any, List
-import requests
+from typing import Dict, Any, List, Optional, Tuple
+import asyncio
+import atexit
+import logging
+import threading
+import time
 import jwt
 from datetime import datetime, timedelta, timezone
 from uuid import uuid4
 
-from langchain_tableau.utilities.utils import http_post
+from langchain_tableau.utilities.utils import http_post, http_session_pool
 
 def jwt_connected_app(
         tableau_domain: str,
@@ -73,7 +77,7 @@ def jwt_connected_app(
         }
     }
 
-    response = requests.post(endpoint, headers=headers, json=payload)
+    response = http_session_pool.post(endpoint, headers=headers, json=payload)
 
     # Check if the request was successful (status code 200)
     if response.status_code == 200:
@@ -162,3 +166,308 @@ async def jwt_connected_app_async(
             f"Status code: {response['status']}. Response: {response['data']}"
         )
         raise RuntimeError(error_message)
+
+
+def jwt_signout(tableau_domain: str, tableau_api: str, api_key: str) -> None:
+    """
+    Signs out of a Tableau session, invalidating its credentials token on the server.
+
+    Args:
+        tableau_domain (str): The domain of the Tableau Server or Tableau Online instance.
+        tableau_api (str): The version of the Tableau API used to sign in.
+        api_key (str): The credentials token of the session to sign out.
+    """
+    endpoint = f"{tableau_domain}/api/{tableau_api}/auth/signout"
+
+    headers = {
+        'X-Tableau-Auth': api_key,
+        'Accept': 'application/json'
+    }
+
+    response = http_session_pool.post(endpoint, headers=headers)
+
+    if response.status_code not in (200, 204):
+        error_message = (
+            f"Failed to sign out of the Tableau site. "
+            f"Status code: {response.status_code}. Response: {response.text}"
+        )
+        raise RuntimeError(error_message)
+
+
+def is_unauthorized(e: Exception) -> bool:
+    """Whether a request to Tableau failed because the server rejected its credentials token"""
+    response = getattr(e, 'response', None)
+    return getattr(response, 'status_code', None) == 401 or "Status code: 401" in str(e)
+
+
+def _session_ttl(tableau_session: Dict[str, Any], default_ttl: float) -> float:
+    """
+    Reads the session lifetime in seconds from a sign-in response. Newer REST API versions report it as
+    'estimatedTimeToExpiration' in HHH:MM:SS format, otherwise the default lifetime is assumed.
+    """
+    estimate = tableau_session.get('credentials', {}).get('estimatedTimeToExpiration')
+    if not estimate:
+        return default_ttl
+    try:
+        hours, minutes, seconds = (int(part) for part in estimate.split(':'))
+    except ValueError:
+        return default_ttl
+    return float(hours * 3600 + minutes * 60 + seconds)
+
+
+class TableauSessionCache:
+    """
+    Thread-safe cache of Tableau sessions obtained with Connected App JWT authentication.
+
+    Sessions are keyed by (domain, site, user, scopes) so that repeated tool calls reuse the same
+    credentials token instead of signing in on every call. Cached sessions are returned until they are
+    within `refresh_margin` seconds of expiring, at which point a new session is requested in a
+    background thread while the still valid token continues to be served. Expired sessions are
+    replaced synchronously. A replaced session is signed out `signout_delay` seconds later, so requests
+    already holding its token can finish, unless it expires before then. Sessions still cached at
+    interpreter shutdown are signed out.
+
+    Args:
+        default_ttl (float): Session lifetime in seconds when the sign-in response does not report one.
+        refresh_margin (float): Seconds before expiry at which a session is refreshed in the background.
+        signout_delay (float): Seconds a replaced session stays signed in for requests still using it.
+    """
+
+    def __init__(
+            self,
+            default_ttl: float = 2 * 60 * 60,
+            refresh_margin: float = 10 * 60,
+            signout_delay: float = 5 * 60
+    ):
+        self.default_ttl = default_ttl
+        self.refresh_margin = refresh_margin
+        self.signout_delay = signout_delay
+        self._sessions: Dict[Tuple, Dict[str, Any]] = {}
+        self._key_locks: Dict[Tuple, threading.Lock] = {}
+        self._async_locks: Dict[Tuple, asyncio.Lock] = {}
+        self._refreshing: set = set()
+        self._background_tasks: set = set()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def session_key(tableau_domain: str, tableau_site: str, tableau_user: str, scopes: List[str]) -> Tuple:
+        return (tableau_domain, tableau_site, tableau_user, tuple(sorted(scopes)))
+
+    def get_session(
+            self,
+            tableau_domain: str,
+            tableau_site: str,
+            tableau_api: str,
+            tableau_user: str,
+            jwt_client_id: str,
+            jwt_secret_id: str,
+            jwt_secret: str,
+            scopes: List[str],
+    ) -> Dict[str, Any]:
+        """
+        Returns a cached Tableau session for the given credentials, signing in when none is available.
+
+        Args and return value match `jwt_connected_app`.
+        """
+        sign_in_args = {
+            "tableau_domain": tableau_domain,
+            "tableau_site": tableau_site,
+            "tableau_api": tableau_api,
+            "tableau_user": tableau_user,
+            "jwt_client_id": jwt_client_id,
+            "jwt_secret_id": jwt_secret_id,
+            "jwt_secret": jwt_secret,
+            "scopes": scopes
+        }
+        key = self.session_key(tableau_domain, tableau_site, tableau_user, scopes)
+
+        entry = self._fresh_entry(key)
+        if entry is not None:
+            if time.monotonic() >= entry['expires_at'] - self.refresh_margin:
+                self._refresh_in_background(key, sign_in_args)
+            return entry['session']
+
+        # only one caller signs in per key, others wait and reuse the new session
+        with self._key_lock(key):
+            entry = self._fresh_entry(key)
+            if entry is not None:
+                return entry['session']
+            return self._sign_in(key, sign_in_args)
+
+    async def aget_session(
+            self,
+            tableau_domain: str,
+            tableau_site: str,
+            tableau_api: str,
+            tableau_user: str,
+            jwt_client_id: str,
+            jwt_secret_id: str,
+            jwt_secret: str,
+            scopes: List[str],
+    ) -> Dict[str, Any]:
+        """
+        Asynchronous version of `get_session`, signs in with `jwt_connected_app_async` when needed
+        and refreshes sessions close to expiry in a task on the running event loop.
+        """
+        sign_in_args = {
+            "tableau_domain": tableau_domain,
+            "tableau_site": tableau_site,
+            "tableau_api": tableau_api,
+            "tableau_user": tableau_user,
+            "jwt_client_id": jwt_client_id,
+            "jwt_secret_id": jwt_secret_id,
+            "jwt_secret": jwt_secret,
+            "scopes": scopes
+        }
+        key = self.session_key(tableau_domain, tableau_site, tableau_user, scopes)
+
+        entry = self._fresh_entry(key)
+        if entry is not None:
+            if time.monotonic() >= entry['expires_at'] - self.refresh_margin:
+                self._arefresh_in_background(key, sign_in_args)
+            return entry['session']
+
+        async with self._async_key_lock(key):
+            entry = self._fresh_entry(key)
+            if entry is not None:
+                return entry['session']
+            return await self._asign_in(key, sign_in_args)
+
+    def invalidate(
+            self,
+            tableau_domain: str,
+            tableau_site: str,
+            tableau_user: str,
+            scopes: List[str],
+            api_key: Optional[str] = None
+    ) -> None:
+        """
+        Drops a cached session, for example after the server rejected its token. When `api_key` is given, the
+        session is only dropped if it still holds that token, so a session another caller already replaced is kept.
+        """
+        key = self.session_key(tableau_domain, tableau_site, tableau_user, scopes)
+        with self._lock:
+            entry = self._sessions.get(key)
+            if entry is not None and (api_key is None or entry['session']['credentials']['token'] == api_key):
+                del self._sessions[key]
+
+    def sign_out_all(self) -> None:
+        """Signs out of every cached session and empties the cache"""
+        with self._lock:
+            entries = list(self._sessions.values())
+            self._sessions.clear()
+
+        for entry in entries:
+            try:
+                jwt_signout(
+                    tableau_domain=entry['domain'],
+                    tableau_api=entry['api'],
+                    api_key=entry['session']['credentials']['token']
+                )
+            except Exception as e:
+                logging.warning(f"Could not sign out of Tableau session: {str(e)}")
+
+    def _fresh_entry(self, key: Tuple) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._sessions.get(key)
+        if entry is not None and time.monotonic() < entry['expires_at']:
+            return entry
+        return None
+
+    def _key_lock(self, key: Tuple) -> threading.Lock:
+        with self._lock:
+            return self._key_locks.setdefault(key, threading.Lock())
+
+    def _async_key_lock(self, key: Tuple) -> asyncio.Lock:
+        # asyncio locks belong to a single event loop
+        loop_key = (id(asyncio.get_running_loop()), key)
+        with self._lock:
+            return self._async_locks.setdefault(loop_key, asyncio.Lock())
+
+    async def _asign_in(self, key: Tuple, sign_in_args: Dict[str, Any]) -> Dict[str, Any]:
+        started = time.monotonic()
+        tableau_session = await jwt_connected_app_async(**sign_in_args)
+        self._store(key, sign_in_args, tableau_session, started)
+        return tableau_session
+
+    def _sign_in(self, key: Tuple, sign_in_args: Dict[str, Any]) -> Dict[str, Any]:
+        started = time.monotonic()
+        tableau_session = jwt_connected_app(**sign_in_args)
+        self._store(key, sign_in_args, tableau_session, started)
+        return tableau_session
+
+    def _store(self, key: Tuple, sign_in_args: Dict[str, Any], tableau_session: Dict[str, Any], started: float) -> None:
+        # expiry is measured from when the request was sent to stay on the safe side of the server clock
+        with self._lock:
+            replaced = self._sessions.get(key)
+            self._sessions[key] = {
+                'session': tableau_session,
+                'expires_at': started + _session_ttl(tableau_session, self.default_ttl),
+                'domain': sign_in_args['tableau_domain'],
+                'api': sign_in_args['tableau_api']
+            }
+
+        # sessions replaced by a refresh are still live on the server, those expiring before the delay are left to expire
+        if replaced is not None and time.monotonic() + self.signout_delay < replaced['expires_at']:
+            self._sign_out_later(replaced)
+
+    def _sign_out_later(self, entry: Dict[str, Any]) -> None:
+        def sign_out():
+            try:
+                jwt_signout(
+                    tableau_domain=entry['domain'],
+                    tableau_api=entry['api'],
+                    api_key=entry['session']['credentials']['token']
+                )
+            except Exception as e:
+                logging.warning(f"Could not sign out of replaced Tableau session: {str(e)}")
+
+        # in-flight requests may still hold the replaced token
+        timer = threading.Timer(self.signout_delay, sign_out)
+        timer.name = "tableau-session-signout"
+        timer.daemon = True
+        timer.start()
+
+    def _refresh_in_background(self, key: Tuple, sign_in_args: Dict[str, Any]) -> None:
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        def refresh():
+            try:
+                with self._key_lock(key):
+                    self._sign_in(key, sign_in_args)
+            except Exception as e:
+                logging.warning(f"Background refresh of Tableau session failed: {str(e)}")
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        threading.Thread(target=refresh, name="tableau-session-refresh", daemon=True).start()
+
+    def _arefresh_in_background(self, key: Tuple, sign_in_args: Dict[str, Any]) -> None:
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        async def refresh():
+            try:
+                async with self._async_key_lock(key):
+                    await self._asign_in(key, sign_in_args)
+            except Exception as e:
+                logging.warning(f"Background refresh of Tableau session failed: {str(e)}")
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        # keep a reference so the task is not garbage collected before it completes
+        task = asyncio.get_running_loop().create_task(refresh())
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
+
+
+# shared cache used by tools, sessions are signed out when the interpreter exits
+tableau_session_cache = TableauSessionCache()
+atexit.register(tableau_session_cache.sign_out_all)
@@ -0,0 +1,413 @@
+import asyncio
+import hashlib
+import json
+import math
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Tuple
+
+from langchain.embeddings.base import Embeddings
+
+from langchain_tableau.utilities.columnar import ColumnarResult
+
+
+class TTLCache:
+    """
+    Thread-safe in-memory cache with least recently used (LRU) eviction and time to live (TTL) expiry.
+
+    Args:
+        maxsize (int): Maximum number of entries, the least recently used entry is evicted beyond this.
+        ttl (Optional[float]): Seconds an entry stays valid after being set, None keeps entries until evicted.
+    """
+
+    def __init__(self, maxsize: int = 128, ttl: Optional[float] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            expires_at, value = entry
+            if expires_at is not None and time.monotonic() >= expires_at:
+                del self._entries[key]
+                return default
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.monotonic() + ttl if ttl is not None else None
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._entries.pop(key, None)
+        return default if entry is None else entry[1]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def items(self) -> List[Tuple[Hashable, Any]]:
+        """Returns a snapshot of unexpired entries without affecting their recency"""
+        now = time.monotonic()
+        with self._lock:
+            return [
+                (key, value) for key, (expires_at, value) in self._entries.items()
+                if expires_at is None or now < expires_at
+            ]
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self.get(key, _MISSING) is not _MISSING
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+
+_MISSING = object()
+
+
+# words that change the meaning of otherwise similar questions, e.g. "last week" vs "last month"
+_GUARD_WORDS = {
+    "minute", "hour", "day", "week", "month", "quarter", "year", "today", "yesterday", "tomorrow",
+    "last", "next", "previous", "current", "this", "ytd", "mtd", "qtd", "top", "bottom", "not", "without",
+    "min", "max", "minimum", "maximum", "average", "avg", "median", "count", "distinct"
+}
+
+
+def normalize_question(question: str) -> str:
+    """Lowercases a question and strips punctuation and repeated whitespace"""
+    return " ".join(re.findall(r"[\w\-\.]+", question.lower())).strip(" .")
+
+
+def _guard_tokens(normalized: str) -> frozenset:
+    tokens = set()
+    for token in normalized.split():
+        stem = token[:-1] if len(token) > 3 and token.endswith("s") else token
+        if any(char.isdigit() for char in token) or stem in _GUARD_WORDS:
+            tokens.add(stem)
+    return frozenset(tokens)
+
+
+def cosine_similarity(a: List[float], b: List[float]) -> float:
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
+
+
+class SemanticQueryCache:
+    """
+    Maps natural language questions about a datasource to VDS payloads that were previously generated
+    for them, letting repeated questions skip the query-writing LLM call.
+
+    Questions are normalized (case, punctuation, whitespace) and an identical normalized question on the same
+    datasource is a hit. When `embeddings` are provided, the most similar cached question on the datasource is
+    also a hit if its cosine similarity reaches `similarity_threshold`. Numbers and words such as "week",
+    "month", "top" or "last" must match exactly for a similar question to be served, so that "sales last week"
+    is never answered with the payload for "sales last month".
+
+    Args:
+        embeddings (Optional[Embeddings]): Model used to embed questions, None restricts the cache to exact matches.
+        similarity_threshold (float): Minimum cosine similarity for a similar question to be a hit.
+        maxsize (int): Maximum number of cached questions across datasources.
+        ttl (Optional[float]): Seconds a cached payload is served for. Keep it short for relative date questions.
+    """
+
+    def __init__(
+        self,
+        embeddings: Optional[Embeddings] = None,
+        similarity_threshold: float = 0.95,
+        maxsize: int = 256,
+        ttl: Optional[float] = 15 * 60
+    ):
+        self.embeddings = embeddings
+        self.similarity_threshold = similarity_threshold
+        self._payloads = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._vectors = TTLCache(maxsize=maxsize * 2, ttl=ttl)
+
+    def get(self, datasource_luid: str, question: str) -> Optional[str]:
+        """Returns a cached VDS payload for the question or None"""
+        normalized = normalize_question(question)
+        entry = self._payloads.get((datasource_luid, normalized))
+        if entry is not None:
+            return entry[0]
+        if self.embeddings is None:
+            return None
+        return self._nearest(datasource_luid, normalized, self._embed(normalized))
+
+    async def aget(self, datasource_luid: str, question: str) -> Optional[str]:
+        normalized = normalize_question(question)
+        entry = self._payloads.get((datasource_luid, normalized))
+        if entry is not None:
+            return entry[0]
+        if self.embeddings is None:
+            return None
+        return self._nearest(datasource_luid, normalized, await self._aembed(normalized))
+
+    def set(self, datasource_luid: str, question: str, payload: str) -> None:
+        """Caches the VDS payload that successfully answered a question"""
+        normalized = normalize_question(question)
+        vector = self._embed(normalized) if self.embeddings is not None else None
+        self._payloads.set((datasource_luid, normalized), (payload, vector))
+
+    async def aset(self, datasource_luid: str, question: str, payload: str) -> None:
+        normalized = normalize_question(question)
+        vector = await self._aembed(normalized) if self.embeddings is not None else None
+        self._payloads.set((datasource_luid, normalized), (payload, vector))
+
+    def clear(self) -> None:
+        self._payloads.clear()
+        self._vectors.clear()
+
+    def _embed(self, normalized: str) -> List[float]:
+        vector = self._vectors.get(normalized)
+        if vector is None:
+            vector = self.embeddings.embed_query(normalized)
+            self._vectors.set(normalized, vector)
+        return vector
+
+    async def _aembed(self, normalized: str) -> List[float]:
+        vector = self._vectors.get(normalized)
+        if vector is None:
+            vector = await self.embeddings.aembed_query(normalized)
+            self._vectors.set(normalized, vector)
+        return vector
+
+    def _nearest(self, datasource_luid: str, normalized: str, vector: List[float]) -> Optional[str]:
+        guard = _guard_tokens(normalized)
+        best_payload, best_score = None, self.similarity_threshold
+        for (luid, cached_question), (payload, cached_vector) in self._payloads.items():
+            if luid != datasource_luid or cached_vector is None or _guard_tokens(cached_question) != guard:
+                continue
+            score = cosine_similarity(vector, cached_vector)
+            if score >= best_score:
+                best_payload, best_score = payload, score
+        return best_payload
+
+
+def vds_query_key(
+    datasource_luid: str,
+    query: Dict[str, Any],
+    user_scope: Optional[str] = None,
+    result_format: str = "rows"
+) -> str:
+    """Hashes a VDS query with sorted keys so that equivalent payloads share the same key"""
+    canonical = json.dumps(
+        [datasource_luid, query, user_scope, result_format],
+        sort_keys=True,
+        separators=(',', ':'),
+        ensure_ascii=False
+    )
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+def _encode_response(value: Any) -> Any:
+    if isinstance(value, ColumnarResult):
+        return {'__columnar__': value.to_dict()}
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _decode_response(value: Dict[str, Any]) -> Any:
+    if '__columnar__' in value:
+        return ColumnarResult.from_dict(value['__columnar__'])
+    return value
+
+
+class VDSResponseCache:
+    """
+    Exact-match cache of VizQL Data Service responses.
+
+    Entries are keyed by a hash of the datasource LUID, the query serialized as JSON with sorted keys and
+    the user scope, since row-level security can give users different results for the same query. Each entry
+    records the datasource version (last update and extract refresh times) it was read at, and lookups made
+    with a different version are misses, so refreshed extracts are never served stale data.
+
+    Args:
+        maxsize (int): Maximum number of responses kept in memory, and on disk when persisted.
+        ttl (Optional[float]): Seconds a response is served for.
+        persist_dir (Optional[str]): Directory where responses are also written as JSON files so that they
+            survive restarts and can be shared by processes on the same host, None keeps them in memory only.
+            Responses contain data the user is entitled to, so the directory is created readable by its owner
+            only and files are written with 0600 permissions.
+    """
+
+    def __init__(self, maxsize: int = 256, ttl: Optional[float] = 5 * 60, persist_dir: Optional[str] = None):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.persist_dir = persist_dir
+        self._responses = TTLCache(maxsize=maxsize, ttl=ttl)
+        if persist_dir:
+            os.makedirs(persist_dir, mode=0o700, exist_ok=True)
+
+    @staticmethod
+    def cache_key(
+        datasource_luid: str,
+        query: Dict[str, Any],
+        user_scope: Optional[str] = None,
+        result_format: str = "rows"
+    ) -> str:
+        return vds_query_key(datasource_luid, query, user_scope, result_format)
+
+    def get(self, key: str, version: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Returns the cached response for a key or None, responses read at another version are dropped"""
+        entry = self._responses.get(key)
+        if entry is None and self.persist_dir:
+            entry = self._read(key)
+            if entry is not None:
+                self._responses.set(key, entry, ttl=entry['expires_at'] - time.time() if entry['expires_at'] else None)
+        if entry is None:
+            return None
+        if version is not None and entry['version'] != version:
+            self._discard(key)
+            return None
+        return entry['response']
+
+    def set(self, key: str, response: Dict[str, Any], datasource_luid: str, version: Optional[str] = None) -> None:
+        entry = {
+            'datasource_luid': datasource_luid,
+            'version': version,
+            'expires_at': time.time() + self.ttl if self.ttl is not None else None,
+            'response': response
+        }
+        self._responses.set(key, entry)
+        if self.persist_dir:
+            self._write(key, entry)
+
+    def invalidate_datasource(self, datasource_luid: str) -> None:
+        """Drops every cached response of a datasource, for example after an extract refresh"""
+        for key, entry in self._responses.items():
+            if entry['datasource_luid'] == datasource_luid:
+                self._discard(key)
+        if self.persist_dir:
+            for key in self._persisted_keys():
+                entry = self._read(key)
+                if entry is not None and entry['datasource_luid'] == datasource_luid:
+                    self._discard(key)
+
+    def clear(self) -> None:
+        self._responses.clear()
+        if self.persist_dir:
+            for key in self._persisted_keys():
+                self._discard(key)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.persist_dir, f"{key}.json")
+
+    def _persisted_keys(self) -> List[str]:
+        return [name[:-5] for name in os.listdir(self.persist_dir) if name.endswith('.json')]
+
+    def _discard(self, key: str) -> None:
+        self._responses.pop(key)
+        if self.persist_dir:
+            try:
+                os.remove(self._path(key))
+            except FileNotFoundError:
+                pass
+
+    def _read(self, key: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self._path(key), encoding='utf-8') as f:
+                entry = json.load(f, object_hook=_decode_response)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        if entry['expires_at'] is not None and time.time() >= entry['expires_at']:
+            self._discard(key)
+            return None
+        return entry
+
+    def _write(self, key: str, entry: Dict[str, Any]) -> None:
+        # write to a temporary file first so readers never see a partial response
+        temporary_path = f"{self._path(key)}.{os.getpid()}.{threading.get_ident()}.tmp"
+        descriptor = os.open(temporary_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(descriptor, 'w', encoding='utf-8') as f:
+            json.dump(entry, f, separators=(',', ':'), default=_encode_response)
+        os.replace(temporary_path, self._path(key))
+        self._prune()
+
+    def _prune(self) -> None:
+        paths = [entry for entry in os.scandir(self.persist_dir) if entry.name.endswith('.json')]
+        if len(paths) <= self.maxsize:
+            return
+        paths.sort(key=lambda entry: entry.stat().st_mtime)
+        for entry in paths[:len(paths) - self.maxsize]:
+            try:
+                os.remove(entry.path)
+            except FileNotFoundError:
+                pass
+
+
+class _Flight:
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls that share a key so that only one of them runs and the others wait for and
+    share its result or exception. Calls made after it completes run again.
+    """
+
+    def __init__(self):
+        self._flights: Dict[Hashable, _Flight] = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: Hashable, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        try:
+            flight.result = fn(*args, **kwargs)
+            return flight.result
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+
+
+class AsyncSingleFlight:
+    """
+    Asynchronous version of `SingleFlight`. The shared call runs as a task, so it completes for the remaining
+    waiters even if the caller that started it is cancelled.
+    """
+
+    def __init__(self):
+        self._flights: Dict[Tuple, asyncio.Task] = {}
+
+    async def do(self, key: Hashable, fn: Callable[..., Awaitable[Any]], *args: Any, **kwargs: Any) -> Any:
+        loop = asyncio.get_running_loop()
+        # tasks belong to a single event loop
+        flight_key = (id(loop), key)
+        task = self._flights.get(flight_key)
+        if task is None:
+            task = loop.create_task(fn(*args, **kwargs))
+            self._flights[flight_key] = task
+            task.add_done_callback(lambda _: self._flights.pop(flight_key, None))
+        return await asyncio.shield(task)
@@ -0,0 +1,101 @@
+from typing import Any, Dict, Iterable, Iterator, List, Tuple
+
+
+class ColumnarResult:
+    """
+    Column-oriented representation of a VizQL Data Service query result.
+
+    VDS returns one JSON object per row, repeating every column name on every row. Storing one list of
+    values per column instead keeps large and wide results compact and lets formatting and analysis work
+    on whole columns at a time.
+
+    Args:
+        columns (List[str]): Column names in the order they were first returned.
+        values (Dict[str, List[Any]]): Values per column, all lists have `row_count` items.
+    """
+
+    __slots__ = ('columns', 'values')
+
+    def __init__(self, columns: List[str], values: Dict[str, List[Any]]):
+        self.columns = columns
+        self.values = values
+
+    @property
+    def row_count(self) -> int:
+        return len(self.values[self.columns[0]]) if self.columns else 0
+
+    def __len__(self) -> int:
+        return self.row_count
+
+    def column(self, name: str) -> List[Any]:
+        return self.values[name]
+
+    def iter_tuples(self) -> Iterator[Tuple[Any, ...]]:
+        """Iterates over rows as tuples of values ordered like `columns`"""
+        return zip(*(self.values[column] for column in self.columns))
+
+    def iter_rows(self) -> Iterator[Dict[str, Any]]:
+        """Iterates over rows as dictionaries, matching the original VDS response format"""
+        for row in self.iter_tuples():
+            yield dict(zip(self.columns, row))
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'columns': self.columns, 'values': self.values}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "ColumnarResult":
+        return cls(columns=data['columns'], values=data['values'])
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[Dict[str, Any]]) -> "ColumnarResult":
+        builder = ColumnarBuilder()
+        for row in rows:
+            builder.append(row.items())
+        return builder.result()
+
+    def to_numpy(self) -> Dict[str, Any]:
+        """Converts each column to a NumPy array, requires the optional `numpy` package"""
+        try:
+            import numpy as np
+        except ImportError:
+            raise ImportError("Converting VDS results to NumPy requires numpy, install it with `pip install numpy`")
+        return {column: np.asarray(self.values[column]) for column in self.columns}
+
+    def to_arrow(self) -> Any:
+        """Converts the result to a `pyarrow.Table`, requires the optional `pyarrow` package"""
+        try:
+            import pyarrow as pa
+        except ImportError:
+            raise ImportError("Converting VDS results to Arrow requires pyarrow, install it with `pip install pyarrow`")
+        return pa.table({column: self.values[column] for column in self.columns})
+
+
+class ColumnarBuilder:
+    """
+    Accumulates rows into column lists as they are parsed from a streamed VDS response, so results are
+    held as columns without keeping a dictionary per row.
+    """
+
+    def __init__(self):
+        self.columns: List[str] = []
+        self.values: Dict[str, List[Any]] = {}
+        self.row_count = 0
+
+    def append(self, pairs: Iterable[Tuple[str, Any]]) -> None:
+        seen = 0
+        for name, value in pairs:
+            column = self.values.get(name)
+            if column is None:
+                # a column missing from earlier rows is back-filled with nulls
+                column = self.values[name] = [None] * self.row_count
+                self.columns.append(name)
+            column.append(value)
+            seen += 1
+        self.row_count += 1
+        if seen != len(self.columns):
+            for column in self.values.values():
+                if len(column) < self.row_count:
+                    column.append(None)
+
+    def result(self) -> ColumnarResult:
+        return ColumnarResult(columns=self.columns, values=self.values)
@@ -0,0 +1,160 @@
+from typing import Any, Dict, List, Optional, Tuple
+
+from langchain_tableau.utilities.columnar import ColumnarResult
+from langchain_tableau.utilities.utils import render_markdown_table
+
+
+# rough characters per token for English text and tabular data, avoids depending on a tokenizer
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def field_column_name(field: Dict[str, Any]) -> str:
+    """Returns the column name VDS uses for a query field in its response"""
+    if field.get('fieldAlias'):
+        return field['fieldAlias']
+    if field.get('function'):
+        return f"{field['function']}({field['fieldCaption']})"
+    return field.get('fieldCaption', '')
+
+
+def sorted_measure(query: Dict[str, Any], columns: List[str]) -> Optional[Tuple[str, bool]]:
+    """
+    Finds the highest priority sorted aggregated field of a VDS query.
+
+    Returns:
+        Optional[Tuple[str, bool]]: The result column of that field and whether it is sorted descending,
+        None if the query does not sort on a column that is in the result.
+    """
+    sorted_fields = [
+        field for field in query.get('fields', [])
+        if field.get('sortPriority') is not None and field.get('function')
+    ]
+    for field in sorted(sorted_fields, key=lambda field: field['sortPriority']):
+        column = field_column_name(field)
+        if column in columns:
+            return column, field.get('sortDirection', 'ASC') == 'DESC'
+    return None
+
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def column_stats(result: ColumnarResult) -> Dict[str, Dict[str, Any]]:
+    """
+    Computes count, distinct count, min, max and for numeric columns sum and mean, one column at a time.
+    """
+    stats = {}
+    for column in result.columns:
+        values = [value for value in result.column(column) if value is not None]
+        column_summary = {
+            'count': len(values),
+            'count_distinct': len(set(values)),
+            'min': None,
+            'max': None,
+            'sum': None,
+            'mean': None
+        }
+        if values and all(_is_number(value) for value in values):
+            total = sum(values)
+            column_summary.update(min=min(values), max=max(values), sum=total, mean=total / len(values))
+        elif values:
+            as_text = [str(value) for value in values]
+            column_summary.update(min=min(as_text), max=max(as_text))
+        stats[column] = column_summary
+    return stats
+
+
+def _format_stat(value: Any) -> str:
+    if value is None:
+        return ''
+    if isinstance(value, float):
+        return f"{value:,.4g}" if abs(value) < 1e15 else f"{value:.4e}"
+    return str(value)
+
+
+def summarize_data_table(
+    result: ColumnarResult,
+    query: Dict[str, Any],
+    token_budget: int,
+    max_cell_chars: int = 80,
+    max_rows: Optional[int] = None,
+    max_chars: Optional[int] = None
+) -> str:
+    """
+    Renders a query result for a prompt within a token budget.
+
+    Results that fit the budget are rendered in full. Larger results are replaced by summary statistics
+    for as many columns as fit the budget followed by as many of the top rows by the query's sorted measure
+    as fit the rest of it, or the first rows when the query does not sort by a measure.
+
+    Args:
+        result (ColumnarResult): The VDS query result.
+        query (Dict[str, Any]): The VDS query that produced the result.
+        token_budget (int): Approximate maximum number of tokens for the rendered output.
+        max_cell_chars (int): Cells longer than this are truncated.
+        max_rows (Optional[int]): Maximum number of result rows rendered, in full or in the sample.
+        max_chars (Optional[int]): Maximum size in characters of the rendered table, applied on top of the budget.
+
+    Returns:
+        str: A markdown table, or summary statistics and a sample of rows with a note of what was left out.
+    """
+    budget_chars = token_budget * CHARS_PER_TOKEN
+    if max_chars is not None:
+        budget_chars = min(budget_chars, max_chars)
+    full_table = render_markdown_table(
+        result,
+        max_rows=max_rows,
+        max_chars=budget_chars,
+        max_cell_chars=max_cell_chars
+    )
+    if not full_table.elided_rows:
+        return full_table.table
+
+    statistics = [
+        {
+            'column': column,
+            'count': _format_stat(column_summary['count']),
+            'count distinct': _format_stat(column_summary['count_distinct']),
+            'min': _format_stat(column_summary['min']),
+            'max': _format_stat(column_summary['max']),
+            'sum': _format_stat(column_summary['sum']),
+            'mean': _format_stat(column_summary['mean'])
+        }
+        for column, column_summary in column_stats(result).items()
+    ]
+
+    measure = sorted_measure(query, result.columns)
+    if measure is not None:
+        column, descending = measure
+        heading = f"Top rows by {column} ({'highest' if descending else 'lowest'} first):"
+        sample = dict(sample="top_k", sort_by=column, sort_descending=descending)
+    else:
+        heading = "First rows:"
+        sample = dict(sample="head")
+
+    intro = f"The result has {result.row_count} rows, too many to include in full. Summary statistics by column:\n\n"
+    sample_heading = f"\n{heading}\n\n"
+    # the statistics of columns beyond the budget are left out like rows
+    statistics_table = render_markdown_table(
+        statistics,
+        max_chars=max(budget_chars - len(intro) - len(sample_heading), 0),
+        max_cell_chars=max_cell_chars
+    ).table
+    remaining_chars = max(budget_chars - len(intro) - len(statistics_table) - len(sample_heading), 0)
+    rows = render_markdown_table(
+        result,
+        max_rows=result.row_count if max_rows is None else max_rows,
+        max_chars=remaining_chars,
+        max_cell_chars=max_cell_chars,
+        **sample
+    )
+    if not rows.rendered_rows:
+        # not even one row fits, the statistics are all there is room for
+        return intro + statistics_table
+
+    return intro + statistics_table + sample_heading + rows.table
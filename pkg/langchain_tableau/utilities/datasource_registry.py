@@ -0,0 +1,118 @@
+import json
+import logging
+import threading
+from collections import Counter
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set
+
+from langchain_tableau.utilities.cache import TTLCache
+
+
+class DatasourceRegistry:
+    """
+    Per data source state for tools that serve many data sources.
+
+    Metadata itself is cached per user and LUID by `get_datasource_metadata`. On top of it, the registry keeps the data
+    dictionary and data model of each data source version compiled into the compact JSON used in prompts, counts
+    how often each data source is queried and loads data sources in the background so that the first question
+    about them does not wait on the Metadata API and VDS metadata requests. With `keep_warm`, the most queried
+    data sources are loaded again every `rewarm_interval` seconds, which reloads their metadata once its cache
+    entry has expired.
+
+    Args:
+        maxsize (int): Maximum number of data source versions with compiled prompt sections.
+        max_workers (int): Threads used to warm data sources in the background.
+        hot_count (int): Number of the most queried data sources kept warm.
+        rewarm_interval (Optional[float]): Seconds between loads of the most queried data sources, None disables it.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = 64,
+        max_workers: int = 4,
+        hot_count: int = 8,
+        rewarm_interval: Optional[float] = 5 * 60
+    ):
+        self.hot_count = hot_count
+        self.rewarm_interval = rewarm_interval
+        self._sections = TTLCache(maxsize=maxsize)
+        self._uses: Counter = Counter()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="tableau-datasource-warmup")
+
+    def record_use(self, datasource_luid: str) -> None:
+        """Counts a question about a data source"""
+        with self._lock:
+            self._uses[datasource_luid] += 1
+
+    def hot_datasources(self, n: int = 8) -> List[str]:
+        """The LUIDs of the `n` most queried data sources, most queried first"""
+        with self._lock:
+            return [luid for luid, _ in self._uses.most_common(n)]
+
+    def prompt_sections(self, datasource_luid: str, metadata: Dict[str, Any]) -> Dict[str, str]:
+        """
+        Returns the data dictionary and data model of a data source as compact JSON, compiled once per version.
+        Pass the metadata as cached, not a copy pruned for a question.
+        """
+        key = (datasource_luid, metadata['meta'].get('datasource_version'))
+        sections = self._sections.get(key)
+        if sections is None:
+            sections = {
+                'data_dictionary': json.dumps(metadata['data_dictionary'], separators=(',', ':')),
+                'data_model': json.dumps(metadata['data_model'], separators=(',', ':'))
+            }
+            self._sections.set(key, sections)
+        return sections
+
+    def warm(self, datasource_luids: Iterable[str], load: Callable[[str], Dict[str, Any]]) -> List[Future]:
+        """
+        Loads data sources in the background with `load`, a function returning the metadata of a LUID such as
+        `get_datasource_metadata` bound to a session, and compiles their prompt sections.
+        """
+        futures = []
+        for luid in datasource_luids:
+            future = self._executor.submit(self._warm, luid, load)
+            futures.append(future)
+        return futures
+
+    def keep_warm(self, datasource_luids: Iterable[str], load: Callable[[str], Dict[str, Any]]) -> Callable[[], None]:
+        """
+        Loads the most queried of `datasource_luids` with `load` every `rewarm_interval` seconds from a background
+        thread, so each caller's data sources are loaded with its own session. Returns a function stopping it.
+        """
+        stopped = threading.Event()
+        if not self.rewarm_interval:
+            return stopped.set
+        datasource_luids = set(datasource_luids)
+        thread = threading.Thread(
+            target=self._rewarm,
+            args=(datasource_luids, load, stopped),
+            name="tableau-datasource-rewarm",
+            daemon=True
+        )
+        thread.start()
+        return stopped.set
+
+    def _rewarm(
+        self,
+        datasource_luids: Set[str],
+        load: Callable[[str], Dict[str, Any]],
+        stopped: threading.Event
+    ) -> None:
+        while not stopped.wait(self.rewarm_interval):
+            with self._lock:
+                hot = [luid for luid, _ in self._uses.most_common() if luid in datasource_luids]
+            for luid in hot[:self.hot_count]:
+                self._executor.submit(self._warm, luid, load)
+
+    def _warm(self, datasource_luid: str, load: Callable[[str], Dict[str, Any]]) -> None:
+        try:
+            self.prompt_sections(datasource_luid, load(datasource_luid))
+        except Exception as e:
+            # the data source is loaded on first use instead
+            logging.warning(f"Failed to warm data source {datasource_luid}: {str(e)}")
+
+
+# shared by tool instances so every data source is compiled and warmed once per process
+datasource_registry = DatasourceRegistry()
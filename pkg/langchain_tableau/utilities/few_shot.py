@@ -0,0 +1,178 @@
+import json
+import re
+import threading
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from langchain.embeddings.base import Embeddings
+
+from langchain_tableau.utilities.cache import cosine_similarity, normalize_question
+
+
+# VDS filter types mapped to the kinds of questions that need them
+FILTER_KEYWORDS = {
+    "DATE": "RELATIVE_DATE",
+    "RELATIVE_DATE": "RELATIVE_DATE",
+    "QUANTITATIVE_DATE": "SPECIFIC_DATE",
+    "QUANTITATIVE_NUMERICAL": "QUANTITATIVE",
+    "TOP": "TOP",
+    "SET": "SET",
+    "MATCH": "MATCH"
+}
+
+_MONTHS = r"(?:jan|feb|mar|apr|may|jun|jul|aug|sep|sept|oct|nov|dec)[a-z]*\.?"
+
+# phrases in a task that call for each kind of filter
+TASK_PATTERNS = {
+    "RELATIVE_DATE": re.compile(
+        r"\b(?:last|previous|past|prior|next|this|current)\s+(?:\d+\s+)?(?:day|week|month|quarter|year)s?\b"
+        r"|\b(?:ytd|mtd|qtd|today|yesterday|ago)\b|\b(?:year|month|quarter) to date\b"
+    ),
+    "SPECIFIC_DATE": re.compile(
+        rf"\b\d{{4}}-\d{{2}}(?:-\d{{2}})?\b|\b{_MONTHS}\s+\d{{1,2}}\b|\b\d{{1,2}}\s+{_MONTHS}"
+        r"|\b(?:since|before|after|until|from|in|during|between)\s+(?:19|20)\d{2}\b"
+    ),
+    "TOP": re.compile(r"\b(?:top|bottom|best|worst|highest|lowest|largest|smallest|most|least)\b"),
+    "QUANTITATIVE": re.compile(
+        r"\b(?:more|greater|less|fewer|over|under|above|below|exceed\w*|at least|at most|between|minimum|maximum)\b"
+    ),
+    "MATCH": re.compile(r"\b(?:contain\w*|starts? with|ends? with|beginning with|matching|like)\b"),
+    "SET": re.compile(r"\b(?:only|exclud\w*|except|other than|either|specific|among)\b")
+}
+
+
+def task_keywords(task: str) -> Set[str]:
+    """Detects the kinds of filters a natural language task is likely to need"""
+    text = task.lower()
+    return {keyword for keyword, pattern in TASK_PATTERNS.items() if pattern.search(text)}
+
+
+def query_keywords(*queries: Optional[Dict[str, Any]]) -> Set[str]:
+    """Kinds of filters used by VDS queries"""
+    keywords = set()
+    for query in queries:
+        for query_filter in (query or {}).get('filters', []):
+            keyword = FILTER_KEYWORDS.get(query_filter.get('filterType'))
+            if keyword is not None:
+                keywords.add(keyword)
+    return keywords
+
+
+class QueryExampleSelector:
+    """
+    Picks the sample and error queries most relevant to a task for the query-writing prompt, rather than
+    including every example in every prompt.
+
+    Examples are indexed once by the kinds of filters their queries use (relative dates, specific dates, top N,
+    sets, matches and quantitative filters). Examples covering the filter kinds a task calls for are chosen
+    first, then the rest are ranked by how many of those kinds they use. When `embeddings` are provided, the
+    similarity between the task and each example's description breaks ties, example embeddings are computed
+    once on first use.
+
+    Args:
+        sample_queries (List[Dict]): Examples with "example" (description) and "query" keys.
+        error_queries (List[Dict]): Examples with "observation", "error", "error_query" and "correction" keys.
+        embeddings (Optional[Embeddings]): Model used to embed tasks and example descriptions.
+        max_error_examples (int): Maximum number of error examples selected for a task.
+    """
+
+    def __init__(
+        self,
+        sample_queries: List[Dict[str, Any]],
+        error_queries: List[Dict[str, Any]],
+        embeddings: Optional[Embeddings] = None,
+        max_error_examples: int = 1
+    ):
+        self.sample_queries = sample_queries
+        self.error_queries = error_queries
+        self.embeddings = embeddings
+        self.max_error_examples = max_error_examples
+        self._sample_keywords = [query_keywords(example.get('query')) for example in sample_queries]
+        self._error_keywords = [
+            query_keywords(example.get('error_query'), example.get('correction')) for example in error_queries
+        ]
+        # each example is serialized once, prompts join the selected ones
+        self._sample_json = [json.dumps(example, separators=(',', ':')) for example in sample_queries]
+        self._error_json = [json.dumps(example, separators=(',', ':')) for example in error_queries]
+        self._all_sample_json = self._join(range(len(sample_queries)), self._sample_json)
+        self._all_error_json = self._join(range(len(error_queries)), self._error_json)
+        self._sample_vectors: Optional[List[List[float]]] = None
+        self._lock = threading.Lock()
+
+    def select(
+        self,
+        task: str,
+        max_examples: Optional[int],
+        previous_errors: Optional[str] = None
+    ) -> Tuple[str, str]:
+        """
+        Returns the sample queries and error queries to include in the prompt for a task as compact JSON arrays,
+        all of them when `max_examples` is None.
+        """
+        if max_examples is None:
+            return self._all_sample_json, self._all_error_json
+        similarities = None
+        if self.embeddings is not None:
+            if self._sample_vectors is None:
+                with self._lock:
+                    if self._sample_vectors is None:
+                        self._sample_vectors = self.embeddings.embed_documents(self._sample_texts())
+            task_vector = self.embeddings.embed_query(normalize_question(task))
+            similarities = [cosine_similarity(task_vector, vector) for vector in self._sample_vectors]
+        return self._select(task, max_examples, previous_errors, similarities)
+
+    async def aselect(
+        self,
+        task: str,
+        max_examples: Optional[int],
+        previous_errors: Optional[str] = None
+    ) -> Tuple[str, str]:
+        if max_examples is None:
+            return self._all_sample_json, self._all_error_json
+        similarities = None
+        if self.embeddings is not None:
+            if self._sample_vectors is None:
+                self._sample_vectors = await self.embeddings.aembed_documents(self._sample_texts())
+            task_vector = await self.embeddings.aembed_query(normalize_question(task))
+            similarities = [cosine_similarity(task_vector, vector) for vector in self._sample_vectors]
+        return self._select(task, max_examples, previous_errors, similarities)
+
+    @staticmethod
+    def _join(indexes, serialized: List[str]) -> str:
+        return "[" + ",".join(serialized[index] for index in indexes) + "]"
+
+    def _sample_texts(self) -> List[str]:
+        return [normalize_question(example.get('example', '')) for example in self.sample_queries]
+
+    def _select(
+        self,
+        task: str,
+        max_examples: int,
+        previous_errors: Optional[str],
+        similarities: Optional[List[float]]
+    ) -> Tuple[str, str]:
+        wanted = task_keywords(task)
+
+        def rank(index: int, covered: Set[str]) -> Tuple[int, float, int, int]:
+            keywords = self._sample_keywords[index]
+            similarity = similarities[index] if similarities is not None else 0.0
+            # more newly covered filter kinds first, then similarity, then simpler examples, then file order
+            return (-len((keywords & wanted) - covered), -similarity, len(keywords - wanted), index)
+
+        selected: List[int] = []
+        covered: Set[str] = set()
+        candidates = list(range(len(self.sample_queries)))
+        while candidates and len(selected) < max_examples:
+            best = min(candidates, key=lambda index: rank(index, covered))
+            candidates.remove(best)
+            selected.append(best)
+            covered |= self._sample_keywords[best] & wanted
+
+        errors = []
+        for index, example in enumerate(self.error_queries):
+            # an error seen on the previous attempt is always relevant to the retry
+            repeated = bool(previous_errors and example.get('error')) and example['error'] in previous_errors
+            if repeated or self._error_keywords[index] & wanted:
+                errors.append((not repeated, index))
+        error_examples = [index for _, index in sorted(errors)[:self.max_error_examples]]
+
+        return self._join(sorted(selected), self._sample_json), self._join(error_examples, self._error_json)
@@ -1,7 +1,6 @@
 import json
-import requests
 from typing import Dict
-from langchain_tableau.utilities.utils import http_post
+from langchain_tableau.utilities.utils import http_post, http_session_pool
 
 
 def get_datasource_query(luid):
@@ -10,6 +9,8 @@ def get_datasource_query(luid):
       publishedDatasources(filter: {{ luid: "{luid}" }}) {{
         name
         description
+        updatedAt
+        extractLastRefreshTime
         owner {{
           name
         }}
@@ -25,15 +26,28 @@ def get_datasource_query(luid):
     return query
 
 
+def get_datasource_freshness_query(luid):
+    query = f"""
+    query DatasourceFreshness {{
+      publishedDatasources(filter: {{ luid: "{luid}" }}) {{
+        updatedAt
+        extractLastRefreshTime
+      }}
+    }}
+    """
+
+    return query
+
+
 async def get_data_dictionary_async(api_key: str, domain: str, datasource_luid: str) -> Dict:
     full_url = f"{domain}/api/metadata/graphql"
 
     query = get_datasource_query(datasource_luid)
 
-    payload = json.dumps({
+    payload = {
         "query": query,
         "variables": {}
-    })
+    }
 
     headers = {
         'Content-Type': 'application/json',
@@ -45,7 +59,7 @@ async def get_data_dictionary_async(api_key: str, domain: str, datasource_luid:
 
     # Check if the request was successful (status code 200)
     if response['status'] == 200:
-        return response['data']
+        return parse_data_dictionary(response['data'])
     else:
         error_message = (
             f"Failed to query Tableau's Metadata API"
@@ -70,10 +84,15 @@ def get_data_dictionary(api_key: str, domain: str, datasource_luid: str) -> Dict
         'X-Tableau-Auth': api_key
     }
 
-    response = requests.post(full_url, headers=headers, data=payload)
+    response = http_session_pool.post(full_url, headers=headers, data=payload, retry=True)
     response.raise_for_status()  # Raise an exception for bad status codes
 
-    json_data = response.json()['data']['publishedDatasources'][0]
+    return parse_data_dictionary(response.json())
+
+
+def parse_data_dictionary(response_json: Dict) -> Dict:
+    """Shapes a Metadata API response for a published datasource into its data dictionary"""
+    json_data = response_json['data']['publishedDatasources'][0]
 
     name = json_data.get('name')
     description = json_data.get('description')
@@ -85,7 +104,71 @@ def get_data_dictionary(api_key: str, domain: str, datasource_luid: str) -> Dict
         'datasource_name': name,
         'datasource_description': description,
         'datasource_owner': owner,
+        'datasource_version': datasource_version(json_data),
         'datasource_fields': fields,
     }
 
     return dictionary
+
+
+def datasource_version(json_data: Dict) -> str:
+    """
+    Identifies the current revision of a published datasource from its last update and extract refresh times,
+    values change whenever the datasource is republished or its extract is refreshed
+    """
+    return f"{json_data.get('updatedAt')}|{json_data.get('extractLastRefreshTime')}"
+
+
+def get_datasource_freshness(api_key: str, domain: str, datasource_luid: str) -> str:
+    """
+    Queries the Metadata API for the last update and extract refresh times of a published datasource.
+    This is a much smaller request than `get_data_dictionary` and is used to revalidate cached metadata.
+
+    Returns:
+        str: The datasource version as described by `datasource_version`
+    """
+    full_url = f"{domain}/api/metadata/graphql"
+
+    payload = json.dumps({
+        "query": get_datasource_freshness_query(datasource_luid),
+        "variables": {}
+    })
+
+    headers = {
+        'Content-Type': 'application/json',
+        'Accept': 'application/json',
+        'X-Tableau-Auth': api_key
+    }
+
+    response = http_session_pool.post(full_url, headers=headers, data=payload, retry=True)
+    response.raise_for_status()  # Raise an exception for bad status codes
+
+    json_data = response.json()['data']['publishedDatasources'][0]
+
+    return datasource_version(json_data)
+
+
+async def get_datasource_freshness_async(api_key: str, domain: str, datasource_luid: str) -> str:
+    full_url = f"{domain}/api/metadata/graphql"
+
+    payload = {
+        "query": get_datasource_freshness_query(datasource_luid),
+        "variables": {}
+    }
+
+    headers = {
+        'Content-Type': 'application/json',
+        'Accept': 'application/json',
+        'X-Tableau-Auth': api_key
+    }
+
+    response = await http_post(endpoint=full_url, headers=headers, payload=payload)
+
+    if response['status'] == 200:
+        return datasource_version(response['data']['data']['publishedDatasources'][0])
+    else:
+        error_message = (
+            f"Failed to query Tableau's Metadata API"
+            f"Status code: {response['status']}. Response: {response['data']}"
+        )
+        raise RuntimeError(error_message)
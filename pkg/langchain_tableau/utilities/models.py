@@ -1,8 +1,11 @@
 import os
+import threading
+from typing import Any, Dict
 
 from langchain_openai import ChatOpenAI, AzureChatOpenAI, OpenAIEmbeddings, AzureOpenAIEmbeddings
 from langchain.chat_models.base import BaseChatModel
 from langchain.embeddings.base import Embeddings
+from langchain_core.messages import BaseMessage
 
 
 def select_model(provider: str = "openai", model_name: str = "gpt-4o-mini", temperature: float = 0.2) -> BaseChatModel:
@@ -37,3 +40,54 @@ def select_embeddings(provider: str = "openai", model_name: str = "text-embeddin
             model=model_name,
             openai_api_key=os.environ.get("OPENAI_API_KEY")
         )
+
+
+def cached_input_tokens(message: BaseMessage) -> int:
+    """
+    Reads the number of prompt tokens served from the provider's prompt cache for a model response, from the
+    standard usage metadata or the raw OpenAI token usage.
+    """
+    usage = getattr(message, 'usage_metadata', None) or {}
+    cache_read = (usage.get('input_token_details') or {}).get('cache_read')
+    if cache_read is not None:
+        return cache_read
+    token_usage = (getattr(message, 'response_metadata', None) or {}).get('token_usage') or {}
+    return (token_usage.get('prompt_tokens_details') or {}).get('cached_tokens') or 0
+
+
+class PromptCacheStats:
+    """
+    Accumulates prompt token usage and provider prompt cache hits across model calls.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.cache_hits = 0
+        self.input_tokens = 0
+        self.cached_tokens = 0
+
+    def record(self, message: BaseMessage) -> None:
+        usage = getattr(message, 'usage_metadata', None) or {}
+        cached = cached_input_tokens(message)
+        with self._lock:
+            self.calls += 1
+            self.input_tokens += usage.get('input_tokens', 0)
+            self.cached_tokens += cached
+            if cached:
+                self.cache_hits += 1
+
+    @property
+    def cached_token_ratio(self) -> float:
+        """Share of prompt tokens that were read from the provider cache"""
+        return self.cached_tokens / self.input_tokens if self.input_tokens else 0.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'calls': self.calls,
+                'cache_hits': self.cache_hits,
+                'input_tokens': self.input_tokens,
+                'cached_tokens': self.cached_tokens,
+                'cached_token_ratio': self.cached_token_ratio
+            }
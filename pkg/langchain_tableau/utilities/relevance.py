@@ -0,0 +1,204 @@
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from langchain.embeddings.base import Embeddings
+
+from langchain_tableau.utilities.cache import TTLCache, cosine_similarity, normalize_question
+
+
+# date fields are kept in pruned prompts since relative date questions rarely name the date field
+DATE_TYPES = {"DATE", "DATETIME"}
+
+
+def _stem(token: str) -> str:
+    # plurals only, enough to match "categories" with "Category" and "sales" with "Sale"
+    if len(token) > 4 and token.endswith("ies"):
+        return token[:-3] + "y"
+    if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+        return token[:-1]
+    return token
+
+
+def _tokens(text: Optional[str]) -> Set[str]:
+    if not text:
+        return set()
+    words = normalize_question(text.replace("_", " ").replace("-", " ")).split()
+    return {_stem(word) for word in words}
+
+
+def lexical_score(question_tokens: Set[str], normalized_question: str, caption: str, description: Optional[str]) -> float:
+    """
+    Scores how well a question mentions a field, 1.0 when the whole caption appears in the question.
+    Caption words count fully and description words at a fraction, so a field is preferred over
+    others that merely describe it.
+    """
+    normalized_caption = normalize_question(caption)
+    if normalized_caption and f" {normalized_caption} " in f" {normalized_question} ":
+        return 1.0
+    caption_tokens = _tokens(caption)
+    caption_score = len(question_tokens & caption_tokens) / len(caption_tokens) if caption_tokens else 0.0
+    description_tokens = _tokens(description)
+    description_score = len(question_tokens & description_tokens) / (len(question_tokens) or 1)
+    return max(caption_score, 0.3 * description_score)
+
+
+def field_text(caption: str, description: Optional[str]) -> str:
+    return f"{caption}: {description}" if description else caption
+
+
+def datasource_fields(metadata: Dict[str, Any]) -> List[Tuple[str, Optional[str]]]:
+    """
+    Lists the fields of a datasource as (caption, description) pairs, the data model captions first followed by
+    fields only found in the data dictionary. Descriptions come from the data dictionary.
+    """
+    descriptions = {field.get('name'): field.get('description') for field in metadata.get('data_dictionary', [])}
+    fields = []
+    seen = set()
+    for field in metadata.get('data_model', []):
+        caption = field.get('fieldCaption')
+        if caption is None or caption in seen:
+            continue
+        seen.add(caption)
+        description = field.get('description') or descriptions.get(caption)
+        fields.append((caption, description))
+    # fields described in the catalog but missing from the data model can still be named by the user
+    for caption, description in descriptions.items():
+        if caption is not None and caption not in seen:
+            seen.add(caption)
+            fields.append((caption, description))
+    return fields
+
+
+class FieldRanker:
+    """
+    Selects the fields of a datasource most relevant to a question, so that prompts for datasources with
+    hundreds of fields only describe the few the query is likely to need.
+
+    Fields are ranked by lexical overlap between the question and each field's caption and description. When
+    `embeddings` are provided, the cosine similarity between the question and each field is averaged in.
+    Field embeddings are computed once per datasource version and cached.
+
+    Args:
+        embeddings (Optional[Embeddings]): Model used to embed fields and questions, None ranks lexically.
+        lexical_weight (float): Weight of the lexical score when combined with embedding similarity.
+        maxsize (int): Maximum number of datasource versions whose field embeddings are cached.
+        ttl (Optional[float]): Seconds field embeddings are cached for.
+    """
+
+    def __init__(
+        self,
+        embeddings: Optional[Embeddings] = None,
+        lexical_weight: float = 0.5,
+        maxsize: int = 64,
+        ttl: Optional[float] = 24 * 60 * 60
+    ):
+        self.embeddings = embeddings
+        self.lexical_weight = lexical_weight
+        self._field_vectors = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    def prune(
+        self,
+        datasource_luid: str,
+        metadata: Dict[str, Any],
+        question: str,
+        max_fields: int,
+        previous_vds_payload: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Returns a copy of datasource metadata whose data dictionary and data model only keep the `max_fields`
+        fields most relevant to the question, plus every date field and any field used by a previous query.
+        """
+        fields = datasource_fields(metadata)
+        if len(fields) <= max_fields:
+            return metadata
+        field_vectors = question_vector = None
+        if self.embeddings is not None:
+            field_vectors = self._embed_fields(datasource_luid, metadata, fields)
+            question_vector = self.embeddings.embed_query(normalize_question(question))
+        selected = self._select(fields, question, max_fields, field_vectors, question_vector)
+        return self._pruned_metadata(metadata, selected, previous_vds_payload)
+
+    async def aprune(
+        self,
+        datasource_luid: str,
+        metadata: Dict[str, Any],
+        question: str,
+        max_fields: int,
+        previous_vds_payload: Optional[str] = None
+    ) -> Dict[str, Any]:
+        fields = datasource_fields(metadata)
+        if len(fields) <= max_fields:
+            return metadata
+        field_vectors = question_vector = None
+        if self.embeddings is not None:
+            field_vectors = await self._aembed_fields(datasource_luid, metadata, fields)
+            question_vector = await self.embeddings.aembed_query(normalize_question(question))
+        selected = self._select(fields, question, max_fields, field_vectors, question_vector)
+        return self._pruned_metadata(metadata, selected, previous_vds_payload)
+
+    def clear(self) -> None:
+        self._field_vectors.clear()
+
+    def _vectors_key(self, datasource_luid: str, metadata: Dict[str, Any]) -> Tuple[str, Optional[str]]:
+        return datasource_luid, metadata.get('meta', {}).get('datasource_version')
+
+    def _embed_fields(self, datasource_luid: str, metadata: Dict[str, Any], fields: List[Tuple[str, Optional[str]]]) -> Dict[str, List[float]]:
+        key = self._vectors_key(datasource_luid, metadata)
+        field_vectors = self._field_vectors.get(key)
+        if field_vectors is None:
+            vectors = self.embeddings.embed_documents([field_text(*field) for field in fields])
+            field_vectors = {caption: vector for (caption, _), vector in zip(fields, vectors)}
+            self._field_vectors.set(key, field_vectors)
+        return field_vectors
+
+    async def _aembed_fields(self, datasource_luid: str, metadata: Dict[str, Any], fields: List[Tuple[str, Optional[str]]]) -> Dict[str, List[float]]:
+        key = self._vectors_key(datasource_luid, metadata)
+        field_vectors = self._field_vectors.get(key)
+        if field_vectors is None:
+            vectors = await self.embeddings.aembed_documents([field_text(*field) for field in fields])
+            field_vectors = {caption: vector for (caption, _), vector in zip(fields, vectors)}
+            self._field_vectors.set(key, field_vectors)
+        return field_vectors
+
+    def _select(
+        self,
+        fields: List[Tuple[str, Optional[str]]],
+        question: str,
+        max_fields: int,
+        field_vectors: Optional[Dict[str, List[float]]],
+        question_vector: Optional[List[float]]
+    ) -> Set[str]:
+        normalized_question = normalize_question(question)
+        question_tokens = _tokens(question)
+        scores = []
+        for position, (caption, description) in enumerate(fields):
+            score = lexical_score(question_tokens, normalized_question, caption, description)
+            if question_vector is not None and caption in field_vectors:
+                similarity = cosine_similarity(question_vector, field_vectors[caption])
+                score = self.lexical_weight * score + (1 - self.lexical_weight) * similarity
+            # ties keep the datasource's own field order
+            scores.append((-score, position, caption))
+        return {caption for _, _, caption in sorted(scores)[:max_fields]}
+
+    def _pruned_metadata(
+        self,
+        metadata: Dict[str, Any],
+        selected: Set[str],
+        previous_vds_payload: Optional[str]
+    ) -> Dict[str, Any]:
+        def keep(caption: Optional[str], data_type: Optional[str] = None) -> bool:
+            if caption in selected or data_type in DATE_TYPES:
+                return True
+            # a query being corrected must still find the fields it used
+            return bool(previous_vds_payload) and f'"{caption}"' in previous_vds_payload
+
+        data_model = [field for field in metadata.get('data_model', []) if keep(field.get('fieldCaption'), field.get('dataType'))]
+        kept = {field.get('fieldCaption') for field in data_model}
+        data_dictionary = [
+            field for field in metadata.get('data_dictionary', [])
+            if field.get('name') in kept or keep(field.get('name'))
+        ]
+        return {**metadata, 'data_dictionary': data_dictionary, 'data_model': data_model}
+
+
+# lexical ranking used when the tool limits prompt fields without an embedding model
+default_field_ranker = FieldRanker()
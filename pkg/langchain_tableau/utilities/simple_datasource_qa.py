@@ -1,30 +1,100 @@
 import os
 import json
 import re
+import asyncio
 import logging
-from typing import Dict, Optional
+from collections import ChainMap
+from concurrent.futures import ThreadPoolExecutor
+from types import MappingProxyType
+from typing import Any, Dict, List, Mapping, Optional
 from dotenv import load_dotenv
 
-from langchain_tableau.utilities.vizql_data_service import query_vds, query_vds_metadata
+from langchain_tableau.utilities.vizql_data_service import (
+    query_vds,
+    query_vds_async,
+    query_vds_metadata,
+    query_vds_metadata_async
+)
 from langchain_tableau.utilities.utils import json_to_markdown_table
-from langchain_tableau.utilities.metadata import get_data_dictionary
+from langchain_tableau.utilities.auth import is_unauthorized
+from langchain_tableau.utilities.metadata import (
+    get_data_dictionary,
+    get_data_dictionary_async,
+    get_datasource_freshness,
+    get_datasource_freshness_async
+)
+from langchain_tableau.utilities.cache import TTLCache, VDSResponseCache
+from langchain_tableau.utilities.columnar import ColumnarResult
+from langchain_tableau.utilities.data_summary import summarize_data_table
+from langchain_tableau.utilities.relevance import FieldRanker, default_field_ranker
+from langchain_tableau.utilities.few_shot import QueryExampleSelector
+from langchain_tableau.utilities.vds_validation import VDSQueryValidator
+from langchain_tableau.utilities.datasource_registry import DatasourceRegistry
 
 
-def get_headlessbi_data(payload: str, url: str, api_key: str, datasource_luid: str):
+# datasource metadata shared across tool invocations, keyed by user scope and datasource LUID
+datasource_metadata_cache = TTLCache(maxsize=64, ttl=60 * 60)
+
+# issues the independent Metadata API and VDS metadata requests concurrently for sync callers
+metadata_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="tableau-metadata")
+
+# sample members of datasource fields, keyed by datasource LUID and version, user scope, field caption and limit
+field_values_cache = TTLCache(maxsize=4096, ttl=60 * 60)
+
+# VDS queries sampling field values at the same time for one call
+FIELD_VALUES_CONCURRENCY = 4
+
+# seconds a field VDS refused to sample is skipped for, instead of querying it again on every call
+FIELD_VALUES_FAILURE_TTL = 10 * 60
+
+
+def get_headlessbi_data(
+    payload: str,
+    url: str,
+    api_key: str,
+    datasource_luid: str,
+    cache: Optional[VDSResponseCache] = None,
+    user_scope: Optional[str] = None,
+    version: Optional[str] = None,
+    max_rows: Optional[int] = None,
+    max_chars: Optional[int] = None,
+    token_budget: Optional[int] = None,
+    validator: Optional[VDSQueryValidator] = None,
+    data_model: Optional[List[Dict]] = None
+):
     json_payload = json.loads(payload)
 
     try:
+        if validator is not None:
+            # malformed queries are rejected here rather than after a round trip to VDS
+            validator.validate(json_payload, data_model)
+
         headlessbi_data = query_vds(
             api_key=api_key,
             datasource_luid=datasource_luid,
             url=url,
-            query=json_payload
+            query=json_payload,
+            cache=cache,
+            user_scope=user_scope,
+            version=version,
+            result_format="columns"
         )
 
         if not headlessbi_data or 'data' not in headlessbi_data:
             raise ValueError("Invalid or empty response from query_vds")
 
-        markdown_table = json_to_markdown_table(headlessbi_data['data'])
+        if token_budget is not None:
+            # results over the token budget are replaced by column statistics and the top rows
+            return summarize_data_table(
+                result=as_columnar(headlessbi_data['data']),
+                query=json_payload,
+                token_budget=token_budget,
+                max_rows=max_rows,
+                max_chars=max_chars
+            )
+
+        # rows beyond the budgets are elided from the table with a note of how many were left out
+        markdown_table = json_to_markdown_table(headlessbi_data['data'], max_rows=max_rows, max_chars=max_chars)
         return markdown_table
 
     except ValueError as ve:
@@ -40,6 +110,76 @@ def get_headlessbi_data(payload: str, url: str, api_key: str, datasource_luid: s
         raise RuntimeError(f"An unexpected error occurred: {str(e)}")
 
 
+async def get_headlessbi_data_async(
+    payload: str,
+    url: str,
+    api_key: str,
+    datasource_luid: str,
+    cache: Optional[VDSResponseCache] = None,
+    user_scope: Optional[str] = None,
+    version: Optional[str] = None,
+    max_rows: Optional[int] = None,
+    max_chars: Optional[int] = None,
+    token_budget: Optional[int] = None,
+    validator: Optional[VDSQueryValidator] = None,
+    data_model: Optional[List[Dict]] = None
+):
+    json_payload = json.loads(payload)
+
+    try:
+        if validator is not None:
+            # malformed queries are rejected here rather than after a round trip to VDS
+            validator.validate(json_payload, data_model)
+
+        headlessbi_data = await query_vds_async(
+            api_key=api_key,
+            datasource_luid=datasource_luid,
+            url=url,
+            query=json_payload,
+            cache=cache,
+            user_scope=user_scope,
+            version=version,
+            result_format="columns"
+        )
+
+        if not headlessbi_data or 'data' not in headlessbi_data:
+            raise ValueError("Invalid or empty response from query_vds_async")
+
+        if token_budget is not None:
+            # results over the token budget are replaced by column statistics and the top rows
+            return summarize_data_table(
+                result=as_columnar(headlessbi_data['data']),
+                query=json_payload,
+                token_budget=token_budget,
+                max_rows=max_rows,
+                max_chars=max_chars
+            )
+
+        # rows beyond the budgets are elided from the table with a note of how many were left out
+        markdown_table = json_to_markdown_table(headlessbi_data['data'], max_rows=max_rows, max_chars=max_chars)
+        return markdown_table
+
+    except ValueError as ve:
+        logging.error(f"Value error in get_headlessbi_data_async: {str(ve)}")
+        raise
+
+    except json.JSONDecodeError as je:
+        logging.error(f"JSON decoding error in get_headlessbi_data_async: {str(je)}")
+        raise ValueError("Invalid JSON format in the payload")
+
+    except Exception as e:
+        logging.error(f"Unexpected error in get_headlessbi_data_async: {str(e)}")
+        raise RuntimeError(f"An unexpected error occurred: {str(e)}")
+
+
+def as_columnar(data) -> ColumnarResult:
+    if isinstance(data, ColumnarResult):
+        return data
+    if not isinstance(data, list) or not data:
+        raise ValueError(f"Invalid JSON data, you may have an error or if the array is empty then it was not possible to resolve the query your wrote: {data}")
+    return ColumnarResult.from_rows(data)
+
+
 def get_payload(output):
     try:
         parsed_output = output.split('JSON_payload')[1]
@@ -58,18 +198,366 @@ def get_payload(output):
         raise ValueError("No JSON payload found in the parsed output")
 
 
-def get_values(api_key: str, url: str, datasource_luid: str, caption: str):
-    column_values = {'fields': [{'fieldCaption': caption}]}
-    output = query_vds(
+def field_values_query(caption: str, limit: int) -> Dict:
+    """
+    A VDS query for the `limit` most frequent members of a field, so VDS returns a handful of rows
+    rather than every distinct member of the column.
+    """
+    field = {'fieldCaption': caption}
+    return {
+        'fields': [field],
+        'filters': [{
+            'field': field,
+            'filterType': 'TOP',
+            'howMany': limit,
+            'direction': 'TOP',
+            'fieldToMeasure': {'fieldCaption': caption, 'function': 'COUNT'}
+        }]
+    }
+
+
+def field_members_query(caption: str) -> Dict:
+    """A VDS query for the members of a field, for data sources rejecting the TOP filter of `field_values_query`"""
+    return {'fields': [{'fieldCaption': caption}]}
+
+
+def is_rejected(e: Exception) -> bool:
+    """Whether VDS rejected a query as invalid, which would fail again if sent unchanged"""
+    return "Status code: 400" in str(e)
+
+
+def field_values(output: Optional[Dict], limit: int) -> Optional[List]:
+    if output is None:
+        return None
+    return [list(item.values())[0] for item in output['data']][:limit]
+
+
+def get_values(api_key: str, url: str, datasource_luid: str, caption: str, limit: int = 4):
+    try:
+        output = query_vds(
+            api_key=api_key,
+            datasource_luid=datasource_luid,
+            url=url,
+            query=field_values_query(caption, limit)
+        )
+    except RuntimeError as e:
+        if not is_rejected(e):
+            raise
+        output = query_vds(
+            api_key=api_key,
+            datasource_luid=datasource_luid,
+            url=url,
+            query=field_members_query(caption)
+        )
+    return field_values(output, limit)
+
+
+async def get_values_async(api_key: str, url: str, datasource_luid: str, caption: str, limit: int = 4):
+    try:
+        output = await query_vds_async(
+            api_key=api_key,
+            datasource_luid=datasource_luid,
+            url=url,
+            query=field_values_query(caption, limit)
+        )
+    except RuntimeError as e:
+        if not is_rejected(e):
+            raise
+        output = await query_vds_async(
+            api_key=api_key,
+            datasource_luid=datasource_luid,
+            url=url,
+            query=field_members_query(caption)
+        )
+    return field_values(output, limit)
+
+
+def string_field_captions(data_model: List[Dict]) -> List[str]:
+    """Captions of the STRING fields of a data model, the fields filtered by SET and MATCH filters"""
+    return [field['fieldCaption'] for field in data_model if field.get('dataType') == 'STRING']
+
+
+def get_field_values(
+    api_key: str,
+    url: str,
+    datasource_luid: str,
+    captions: List[str],
+    limit: int = 4,
+    version: Optional[str] = None,
+    user_scope: Optional[str] = None,
+    cache: Optional[TTLCache] = field_values_cache,
+    max_concurrency: int = FIELD_VALUES_CONCURRENCY
+) -> Dict[str, List]:
+    """
+    Samples the most frequent members of many fields, such as the STRING fields of a datasource.
+
+    Each field is sampled with a TOP filter so only `limit` rows are returned, and at most `max_concurrency`
+    fields are queried at a time. Fields whose TOP filter is rejected are sampled from their members instead.
+    Samples are cached per datasource version and user, since row-level security may hide members from some
+    users, so filter value hints only cost VDS queries once. Fields VDS rejects both queries for are not queried
+    again for `FIELD_VALUES_FAILURE_TTL` seconds, other failures are retried on the next call. Rejected
+    credentials raise so the caller can sign in again.
+
+    Args:
+        api_key (str): The API key for authentication.
+        url (str): The base URL for the API endpoints.
+        datasource_luid (str): The unique identifier of the datasource.
+        captions (List[str]): Captions of the fields to sample.
+        limit (int): Number of members sampled per field.
+        version (Optional[str]): Datasource version, see `metadata.datasource_version`.
+        user_scope (Optional[str]): Identifies who the samples were queried for, such as site and user.
+        cache (Optional[TTLCache]): Cache for sampled values, None disables caching.
+        max_concurrency (int): Maximum number of VDS queries in flight at once.
+
+    Returns:
+        Dict[str, List]: Sampled members by field caption. Fields that could not be sampled are left out.
+    """
+    samples, missing = cached_field_values(datasource_luid, captions, limit, version, user_scope, cache)
+    if not missing:
+        return samples
+
+    rejected = set()
+
+    def sample(caption: str) -> Optional[List]:
+        try:
+            return get_values(api_key=api_key, url=url, datasource_luid=datasource_luid, caption=caption, limit=limit)
+        except Exception as e:
+            if is_unauthorized(e):
+                raise
+            sample_failed(caption, e, rejected)
+            return None
+
+    with ThreadPoolExecutor(max_workers=min(max_concurrency, len(missing))) as executor:
+        values = list(executor.map(sample, missing))
+
+    return store_field_values(samples, missing, values, rejected, datasource_luid, limit, version, user_scope, cache)
+
+
+async def get_field_values_async(
+    api_key: str,
+    url: str,
+    datasource_luid: str,
+    captions: List[str],
+    limit: int = 4,
+    version: Optional[str] = None,
+    user_scope: Optional[str] = None,
+    cache: Optional[TTLCache] = field_values_cache,
+    max_concurrency: int = FIELD_VALUES_CONCURRENCY
+) -> Dict[str, List]:
+    """
+    Asynchronous version of `get_field_values`.
+    """
+    samples, missing = cached_field_values(datasource_luid, captions, limit, version, user_scope, cache)
+    if not missing:
+        return samples
+
+    semaphore = asyncio.Semaphore(max_concurrency)
+    rejected = set()
+
+    async def sample(caption: str) -> Optional[List]:
+        async with semaphore:
+            try:
+                return await get_values_async(
+                    api_key=api_key, url=url, datasource_luid=datasource_luid, caption=caption, limit=limit
+                )
+            except Exception as e:
+                if is_unauthorized(e):
+                    raise
+                sample_failed(caption, e, rejected)
+                return None
+
+    values = await asyncio.gather(*(sample(caption) for caption in missing))
+
+    return store_field_values(samples, missing, values, rejected, datasource_luid, limit, version, user_scope, cache)
+
+
+def cached_field_values(datasource_luid, captions, limit, version, user_scope, cache):
+    samples, missing = {}, []
+    for caption in dict.fromkeys(captions):
+        cached = cache.get((datasource_luid, version, user_scope, caption, limit)) if cache is not None else None
+        if cached is None:
+            missing.append(caption)
+        elif cached:
+            samples[caption] = cached
+    return samples, missing
+
+
+def sample_failed(caption, e, rejected):
+    logging.warning(f"Failed to sample values of field {caption}: {str(e)}")
+    if is_rejected(e):
+        rejected.add(caption)
+
+
+def store_field_values(samples, captions, values, rejected, datasource_luid, limit, version, user_scope, cache):
+    for caption, sampled in zip(captions, values):
+        if sampled:
+            samples[caption] = sampled
+        if cache is None or (sampled is None and caption not in rejected):
+            # transient failures such as timeouts are sampled again on the next call
+            continue
+        # fields VDS refuses to sample are cached as empty samples for a shorter time
+        cache.set(
+            (datasource_luid, version, user_scope, caption, limit),
+            sampled or [],
+            ttl=FIELD_VALUES_FAILURE_TTL if sampled is None else None
+        )
+    return samples
+
+
+def with_sample_values(data_model: List[Dict], samples: Dict[str, List]) -> List[Dict]:
+    """Returns a copy of a data model with the sampled members of each field as "sampleValues" """
+    return [
+        {**field, 'sampleValues': samples[field['fieldCaption']]} if field.get('fieldCaption') in samples else field
+        for field in data_model
+    ]
+
+
+def get_datasource_metadata(
+    api_key: str,
+    url: str,
+    datasource_luid: str,
+    cache: Optional[TTLCache] = datasource_metadata_cache,
+    revalidate: bool = False,
+    user_scope: Optional[str] = None
+) -> Dict:
+    """
+    Retrieves the data dictionary and data model of a datasource, served from a cache when possible.
+
+    The data dictionary comes from the Metadata API and the data model from the VDS metadata endpoint.
+    Both rarely change between questions, so results are cached by user scope and datasource LUID, a user
+    is never served metadata of a datasource they could not read themselves. When `revalidate`
+    is set, a lightweight Metadata API query checks the datasource last update and extract refresh
+    times and the cached entry is only reused if neither has changed.
+
+    Args:
+        api_key (str): The API key for authentication.
+        url (str): The base URL for the API endpoints.
+        datasource_luid (str): The unique identifier of the datasource.
+        cache (Optional[TTLCache]): Cache for datasource metadata, None disables caching.
+        revalidate (bool): Whether to check the datasource version before reusing cached metadata.
+        user_scope (Optional[str]): Identifies who the metadata is read for, such as domain, site and user.
+
+    Returns:
+        Dict: 'data_dictionary', 'meta' and 'data_model' keys for the datasource. Treat it as read-only
+        since it may be shared with other callers.
+    """
+    if cache is not None:
+        cached = cache.get((user_scope, datasource_luid))
+        if cached is not None:
+            if not revalidate:
+                return cached
+            version = get_datasource_freshness(
+                api_key=api_key,
+                domain=url,
+                datasource_luid=datasource_luid
+            )
+            if version == cached['meta'].get('datasource_version'):
+                return cached
+
+    # the Metadata API and VDS metadata requests are independent, so they run at the same time
+    data_dictionary_future = metadata_executor.submit(
+        get_data_dictionary,
+        api_key=api_key,
+        domain=url,
+        datasource_luid=datasource_luid
+    )
+    datasource_metadata_future = metadata_executor.submit(
+        query_vds_metadata,
         api_key=api_key,
-        datasource_luid=datasource_luid,
         url=url,
-        query=column_values
+        datasource_luid=datasource_luid
+    )
+
+    metadata = merge_datasource_metadata(
+        data_dictionary=data_dictionary_future.result(),
+        datasource_metadata=datasource_metadata_future.result()
     )
-    if output is None:
-        return None
-    sample_values = [list(item.values())[0] for item in output['data']][:4]
-    return sample_values
+
+    if cache is not None:
+        cache.set((user_scope, datasource_luid), metadata)
+
+    return metadata
+
+
+async def get_datasource_metadata_async(
+    api_key: str,
+    url: str,
+    datasource_luid: str,
+    cache: Optional[TTLCache] = datasource_metadata_cache,
+    revalidate: bool = False,
+    user_scope: Optional[str] = None
+) -> Dict:
+    """
+    Asynchronous version of `get_datasource_metadata`, both metadata requests are awaited concurrently.
+    """
+    if cache is not None:
+        cached = cache.get((user_scope, datasource_luid))
+        if cached is not None:
+            if not revalidate:
+                return cached
+            version = await get_datasource_freshness_async(
+                api_key=api_key,
+                domain=url,
+                datasource_luid=datasource_luid
+            )
+            if version == cached['meta'].get('datasource_version'):
+                return cached
+
+    data_dictionary, datasource_metadata = await asyncio.gather(
+        get_data_dictionary_async(
+            api_key=api_key,
+            domain=url,
+            datasource_luid=datasource_luid
+        ),
+        query_vds_metadata_async(
+            api_key=api_key,
+            url=url,
+            datasource_luid=datasource_luid
+        )
+    )
+
+    metadata = merge_datasource_metadata(
+        data_dictionary=data_dictionary,
+        datasource_metadata=datasource_metadata
+    )
+
+    if cache is not None:
+        cache.set((user_scope, datasource_luid), metadata)
+
+    return metadata
+
+
+def merge_datasource_metadata(data_dictionary: Dict, datasource_metadata: Dict) -> Dict:
+    """
+    Combines the Metadata API data dictionary and the VDS data model into the metadata used by prompts.
+    """
+    for field in datasource_metadata['data']:
+        field.pop('fieldName', None)
+        field.pop('logicalTableId', None)
+
+    return {
+        # data dictionary from Tableau's Data Catalog
+        'data_dictionary': data_dictionary.pop('datasource_fields'),
+        # data source name, description, owner and version
+        'meta': data_dictionary,
+        # data model with sample values from Tableau's VDS metadata API
+        'data_model': datasource_metadata['data']
+    }
+
+
+def layer_prompt_inputs(prompt: Mapping[str, Any], inputs: Dict[str, Any]) -> Mapping[str, Any]:
+    """
+    Layers the inputs of a single request over shared prompt data without copying or modifying it.
+
+    Args:
+        prompt (Mapping[str, Any]): Shared prompt sections, such as `vds_prompt_data`.
+        inputs (Dict[str, Any]): Values for this request, taking precedence over `prompt`.
+
+    Returns:
+        Mapping[str, Any]: A read-only view of the request's prompt inputs. Convert it with `dict()` to format a
+        prompt template, or layer it again to derive the inputs of a retry.
+    """
+    return MappingProxyType(ChainMap(inputs, prompt))
 
 
 def augment_datasource_metadata(
@@ -77,69 +565,192 @@ def augment_datasource_metadata(
     api_key: str,
     url: str,
     datasource_luid: str,
-    prompt: Dict[str, str],
+    prompt: Mapping[str, Any],
     previous_errors: Optional[str] = None,
-    previous_vds_payload: Optional[str] = None
+    previous_vds_payload: Optional[str] = None,
+    cache: Optional[TTLCache] = datasource_metadata_cache,
+    revalidate: bool = False,
+    max_fields: Optional[int] = None,
+    field_ranker: FieldRanker = default_field_ranker,
+    max_examples: Optional[int] = None,
+    example_selector: Optional[QueryExampleSelector] = None,
+    registry: Optional[DatasourceRegistry] = None,
+    sample_values: Optional[int] = None,
+    user_scope: Optional[str] = None
 ):
     """
     Augment datasource metadata with additional information and format as JSON.
 
     This function retrieves the data dictionary and sample field values for a given
-    datasource, adds them to the provided prompt dictionary, and includes any previous
-    errors or queries for debugging purposes.
+    datasource, layers them over the provided prompt data, and includes any previous
+    errors or queries for debugging purposes. The prompt data is never modified, so
+    concurrent calls can share it.
 
     Args:
         api_key (str): The API key for authentication.
         url (str): The base URL for the API endpoints.
         datasource_luid (str): The unique identifier of the datasource.
-        prompt (Dict[str, str]): Initial prompt dictionary to be augmented.
+        prompt (Mapping[str, Any]): Shared prompt data the request's inputs are layered over.
         previous_errors (Optional[str]): Any errors from previous function calls. Defaults to None.
         previous_vds_payload (Optional[str]): The query that caused errors in previous calls. Defaults to None.
+        cache (Optional[TTLCache]): Cache for datasource metadata, None disables caching.
+        revalidate (bool): Whether to check the datasource version before reusing cached metadata.
+        max_fields (Optional[int]): Only describe this many fields most relevant to the task, plus date fields
+            and fields used by the previous query. None describes every field.
+        field_ranker (FieldRanker): Ranks fields by relevance to the task when `max_fields` is set.
+        max_examples (Optional[int]): Only include this many sample queries most relevant to the task.
+        example_selector (Optional[QueryExampleSelector]): Selects the sample and error queries for the task,
+            None keeps the examples in `prompt`.
+        registry (Optional[DatasourceRegistry]): Provides the datasource's data dictionary and data model compiled
+            once per datasource version, unless fields are pruned or sampled for the task.
+        sample_values (Optional[int]): Adds this many sampled members to each STRING field of the data model as
+            hints for filter values, see `get_field_values`. None adds no samples.
+        user_scope (Optional[str]): Identifies the user metadata and sampled values are cached for.
 
     Returns:
-        str: A JSON string containing the augmented prompt dictionary with datasource metadata.
+        Mapping[str, Any]: A read-only view of the prompt inputs for this request.
 
     Note:
-        This function relies on external functions `get_data_dictionary` and `query_vds_metadata`
-        to retrieve the necessary datasource information.
+        This function relies on `get_datasource_metadata` to retrieve the necessary datasource information.
     """
-    # insert the user input as a task
-    prompt['task'] = task
-
-    # get dictionary for the data source from the Metadata API
-    data_dictionary = get_data_dictionary(
+    datasource_metadata = get_datasource_metadata(
         api_key=api_key,
-        domain=url,
-        datasource_luid=datasource_luid
+        url=url,
+        datasource_luid=datasource_luid,
+        cache=cache,
+        revalidate=revalidate,
+        user_scope=user_scope
     )
 
-    # insert data dictionary from Tableau's Data Catalog
-    prompt['data_dictionary'] = data_dictionary['datasource_fields']
-    # insert data source name, description and owner into 'meta' key
-    del data_dictionary['datasource_fields']
-    prompt['meta'] = data_dictionary
+    # insert the user input as a task, queries are validated against every field including those pruned from the prompt
+    inputs = {
+        'task': task,
+        'datasource_fields': datasource_metadata['data_model']
+    }
+
+    if max_fields is not None:
+        # the cached metadata is left whole, pruning returns a copy for this task
+        datasource_metadata = field_ranker.prune(
+            datasource_luid=datasource_luid,
+            metadata=datasource_metadata,
+            question=task,
+            max_fields=max_fields,
+            previous_vds_payload=previous_vds_payload
+        )
+
+    inputs['data_dictionary'] = datasource_metadata['data_dictionary']
+    inputs['meta'] = datasource_metadata['meta']
+    inputs['data_model'] = datasource_metadata['data_model']
+
+    if sample_values is not None:
+        samples = get_field_values(
+            api_key=api_key,
+            url=url,
+            datasource_luid=datasource_luid,
+            captions=string_field_captions(inputs['data_model']),
+            limit=sample_values,
+            version=datasource_metadata['meta'].get('datasource_version'),
+            user_scope=user_scope
+        )
+        inputs['data_model'] = with_sample_values(inputs['data_model'], samples)
+
+    if registry is not None and max_fields is None and sample_values is None:
+        inputs.update(registry.prompt_sections(datasource_luid, datasource_metadata))
+
+    if example_selector is not None:
+        inputs['sample_queries'], inputs['error_queries'] = example_selector.select(
+            task=task,
+            max_examples=max_examples,
+            previous_errors=previous_errors
+        )
+
+    # include previous error and query to debug in current run
+    if previous_errors:
+        inputs['previous_call_error'] = previous_errors
+    if previous_vds_payload:
+        inputs['previous_vds_payload'] = previous_vds_payload
+
+    return layer_prompt_inputs(prompt, inputs)
 
-    #  get sample values for fields from VDS metadata endpoint
-    datasource_metadata = query_vds_metadata(
+
+async def augment_datasource_metadata_async(
+    task: str,
+    api_key: str,
+    url: str,
+    datasource_luid: str,
+    prompt: Mapping[str, Any],
+    previous_errors: Optional[str] = None,
+    previous_vds_payload: Optional[str] = None,
+    cache: Optional[TTLCache] = datasource_metadata_cache,
+    revalidate: bool = False,
+    max_fields: Optional[int] = None,
+    field_ranker: FieldRanker = default_field_ranker,
+    max_examples: Optional[int] = None,
+    example_selector: Optional[QueryExampleSelector] = None,
+    registry: Optional[DatasourceRegistry] = None,
+    sample_values: Optional[int] = None,
+    user_scope: Optional[str] = None
+):
+    """
+    Asynchronous version of `augment_datasource_metadata`.
+    """
+    datasource_metadata = await get_datasource_metadata_async(
         api_key=api_key,
         url=url,
-        datasource_luid=datasource_luid
+        datasource_luid=datasource_luid,
+        cache=cache,
+        revalidate=revalidate,
+        user_scope=user_scope
     )
 
-    for field in datasource_metadata['data']:
-        del field['fieldName']
-        del field['logicalTableId']
+    # insert the user input as a task, queries are validated against every field including those pruned from the prompt
+    inputs = {
+        'task': task,
+        'datasource_fields': datasource_metadata['data_model']
+    }
 
-    # insert the data model with sample values from Tableau's VDS metadata API
-    prompt['data_model'] = datasource_metadata['data']
+    if max_fields is not None:
+        datasource_metadata = await field_ranker.aprune(
+            datasource_luid=datasource_luid,
+            metadata=datasource_metadata,
+            question=task,
+            max_fields=max_fields,
+            previous_vds_payload=previous_vds_payload
+        )
+
+    inputs['data_dictionary'] = datasource_metadata['data_dictionary']
+    inputs['meta'] = datasource_metadata['meta']
+    inputs['data_model'] = datasource_metadata['data_model']
+
+    if sample_values is not None:
+        samples = await get_field_values_async(
+            api_key=api_key,
+            url=url,
+            datasource_luid=datasource_luid,
+            captions=string_field_captions(inputs['data_model']),
+            limit=sample_values,
+            version=datasource_metadata['meta'].get('datasource_version'),
+            user_scope=user_scope
+        )
+        inputs['data_model'] = with_sample_values(inputs['data_model'], samples)
+
+    if registry is not None and max_fields is None and sample_values is None:
+        inputs.update(registry.prompt_sections(datasource_luid, datasource_metadata))
+
+    if example_selector is not None:
+        inputs['sample_queries'], inputs['error_queries'] = await example_selector.aselect(
+            task=task,
+            max_examples=max_examples,
+            previous_errors=previous_errors
+        )
 
     # include previous error and query to debug in current run
     if previous_errors:
-        prompt['previous_call_error'] = previous_errors
+        inputs['previous_call_error'] = previous_errors
     if previous_vds_payload:
-        prompt['previous_vds_payload'] = previous_vds_payload
+        inputs['previous_vds_payload'] = previous_vds_payload
 
-    return prompt
+    return layer_prompt_inputs(prompt, inputs)
 
 
 def prepare_prompt_inputs(data: dict, user_string: str) -> dict:
@@ -174,7 +785,8 @@ def env_vars_simple_datasource_qa(
     tableau_user=None,
     datasource_luid=None,
     model_provider=None,
-    tooling_llm_model=None
+    tooling_llm_model=None,
+    datasource_luids=None
 ):
     """
     Retrieves Tableau configuration from environment variables if not provided as arguments.
@@ -189,6 +801,7 @@ def env_vars_simple_datasource_qa(
         tableau_user (str, optional): Tableau user
         datasource_luid (str, optional): Datasource LUID
         tooling_llm_model (str, optional): Tooling LLM model
+        datasource_luids (list, optional): Data sources a call may select, makes DATASOURCE_LUID optional
 
     Returns:
         dict: A dictionary containing all the configuration values
@@ -204,7 +817,9 @@ def env_vars_simple_datasource_qa(
         'jwt_secret': jwt_secret or os.environ['TABLEAU_JWT_SECRET'],
         'tableau_api_version': tableau_api_version or os.environ['TABLEAU_API_VERSION'],
         'tableau_user': tableau_user or os.environ['TABLEAU_USER'],
-        'datasource_luid': datasource_luid or os.environ['DATASOURCE_LUID'],
+        'datasource_luid': datasource_luid or (
+            os.environ.get('DATASOURCE_LUID') if datasource_luids is not None else os.environ['DATASOURCE_LUID']
+        ),
         'model_provider': model_provider or os.environ['MODEL_PROVIDER'],
         'tooling_llm_model': tooling_llm_model or os.environ['TOOLING_MODEL']
     }
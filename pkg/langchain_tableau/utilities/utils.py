@@ -1,29 +1,285 @@
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+import asyncio
+import gzip
+import heapq
+from collections import deque
+from collections.abc import Iterator
+from itertools import chain, islice
+import threading
+import time
+import weakref
+from http.cookiejar import DefaultCookiePolicy
 import aiohttp
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import json
 
+from langchain_tableau.utilities.columnar import ColumnarResult
 
-async def http_get(endpoint: str, headers: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+
+class HTTPSessionPool:
+    """
+    Shared, pooled requests Session used by the synchronous Tableau clients (auth, Metadata API and VDS)
+    so that calls to the same Tableau host reuse keep-alive connections.
+
+    Connection failures are retried with exponential backoff. POST requests are only retried on 429 and 5xx
+    responses when the call opts in with `retry=True`, since a sign-in must not be replayed with the same JWT.
+    Read-only queries such as the Metadata API and VDS metadata opt in, honoring Retry-After.
+    Responses are requested with gzip compression and request bodies can optionally be gzip compressed.
+    Cookies are never stored so that sessions of different Tableau users cannot leak into each other,
+    which keeps the shared session safe to use from many threads.
+
+    Args:
+        pool_connections (int): Number of host connection pools to cache.
+        pool_maxsize (int): Maximum number of connections kept per host, should match thread concurrency.
+        max_retries (int): Maximum number of retries for failed requests.
+        backoff_factor (float): Backoff factor in seconds between retries, doubles after each attempt.
+        status_forcelist (Sequence[int]): Response status codes that trigger a retry.
+        timeout (Optional[float]): Seconds to wait for the server before giving up on a request.
+        compress_requests (bool): Gzip request bodies larger than `compress_min_bytes`.
+        compress_min_bytes (int): Minimum body size in bytes to compress when `compress_requests` is set.
+    """
+
+    def __init__(
+        self,
+        pool_connections: int = 10,
+        pool_maxsize: int = 20,
+        max_retries: int = 3,
+        backoff_factor: float = 0.5,
+        status_forcelist: Sequence[int] = (429, 500, 502, 503, 504),
+        timeout: Optional[float] = 120,
+        compress_requests: bool = False,
+        compress_min_bytes: int = 1024
+    ):
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.status_forcelist = status_forcelist
+        self.timeout = timeout
+        self.compress_requests = compress_requests
+        self.compress_min_bytes = compress_min_bytes
+        self._session: Optional[requests.Session] = None
+        self._lock = threading.Lock()
+
+    def configure(self, **settings: Any) -> None:
+        """Updates pool, retry and compression settings, the pooled session is rebuilt on next use"""
+        for name, value in settings.items():
+            if not hasattr(self, name) or name.startswith('_'):
+                raise ValueError(f"Unknown HTTP session setting: {name}")
+            setattr(self, name, value)
+        self.close()
+
+    @property
+    def session(self) -> requests.Session:
+        with self._lock:
+            if self._session is None:
+                self._session = self._build_session()
+            return self._session
+
+    def _build_session(self) -> requests.Session:
+        # requests that never reached the server are retried for any method, responses only for idempotent methods
+        retry = Retry(
+            total=self.max_retries,
+            backoff_factor=self.backoff_factor,
+            status_forcelist=self.status_forcelist,
+            allowed_methods=Retry.DEFAULT_ALLOWED_METHODS,
+            respect_retry_after_header=True,
+            raise_on_status=False
+        )
+        adapter = HTTPAdapter(
+            pool_connections=self.pool_connections,
+            pool_maxsize=self.pool_maxsize,
+            max_retries=retry
+        )
+        session = requests.Session()
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        session.headers['Accept-Encoding'] = 'gzip, deflate'
+        session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+        return session
+
+    def post(
+        self,
+        url: str,
+        headers: Optional[Dict[str, str]] = None,
+        json: Optional[Any] = None,
+        data: Optional[Any] = None,
+        stream: bool = False,
+        retry: bool = False
+    ) -> requests.Response:
+        """
+        Sends a POST request through the pooled session, arguments follow `requests.post`. With `retry`, responses
+        with a status in `status_forcelist` are retried up to `max_retries` times, only set it for read-only requests.
+        """
+        headers = dict(headers or {})
+        if json is not None:
+            data = _json_dumps(json)
+            headers.setdefault('Content-Type', 'application/json')
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        if self.compress_requests and data and len(data) >= self.compress_min_bytes:
+            data = gzip.compress(data)
+            headers['Content-Encoding'] = 'gzip'
+        attempts = self.max_retries if retry else 0
+        for attempt in range(attempts + 1):
+            response = self.session.post(url, headers=headers, data=data, timeout=self.timeout, stream=stream)
+            if attempt == attempts or response.status_code not in self.status_forcelist:
+                return response
+            delay = _retry_after(response)
+            if delay is None:
+                delay = self.backoff_factor * (2 ** attempt)
+            response.close()
+            time.sleep(delay)
+
+    def close(self) -> None:
+        """Closes the pooled session and its connections"""
+        with self._lock:
+            session, self._session = self._session, None
+        if session is not None:
+            session.close()
+
+
+def _retry_after(response: requests.Response) -> Optional[float]:
+    try:
+        return max(float(response.headers['Retry-After']), 0.0)
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def _json_dumps(payload: Any) -> str:
+    return json.dumps(payload, separators=(',', ':'))
+
+
+# shared pool used by the synchronous Tableau clients
+http_session_pool = HTTPSessionPool()
+
+
+class AsyncHTTPClient:
+    """
+    Manages shared aiohttp ClientSessions so that asynchronous requests reuse pooled keep-alive connections
+    instead of paying for a new connector, DNS lookup and TLS handshake on every call.
+
+    aiohttp sessions are bound to the event loop that created them, so one session is kept per running loop.
+    Sessions are closed when their loop shuts down its async generators, as `asyncio.run` does before closing
+    the loop. Call `close` (or use the client as an async context manager) to close them earlier.
+
+    Args:
+        limit (int): Maximum number of simultaneous connections across all hosts.
+        limit_per_host (int): Maximum number of simultaneous connections to the same host.
+        timeout (float): Total timeout in seconds for a request, including reading the response.
+        connect_timeout (Optional[float]): Timeout in seconds to acquire a connection and connect to the host.
+        keepalive_timeout (float): Seconds an idle connection is kept open for reuse.
+        dns_cache_ttl (int): Seconds DNS lookups are cached for.
+    """
+
+    def __init__(
+        self,
+        limit: int = 100,
+        limit_per_host: int = 20,
+        timeout: float = 120,
+        connect_timeout: Optional[float] = 30,
+        keepalive_timeout: float = 60,
+        dns_cache_ttl: int = 300
+    ):
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self.keepalive_timeout = keepalive_timeout
+        self.dns_cache_ttl = dns_cache_ttl
+        # each session is kept with the async generator that closes it when its loop shuts down
+        self._sessions: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Tuple[aiohttp.ClientSession, Any]]" = (
+            weakref.WeakKeyDictionary()
+        )
+
+    def configure(self, **settings: Any) -> None:
+        """
+        Updates connection pool and timeout settings. Sessions that are already open keep their settings
+        until they are closed.
+        """
+        for name, value in settings.items():
+            if not hasattr(self, name) or name.startswith('_'):
+                raise ValueError(f"Unknown HTTP client setting: {name}")
+            setattr(self, name, value)
+
+    async def get_session(self) -> aiohttp.ClientSession:
+        """Returns the shared session of the running event loop, opening one if needed"""
+        loop = asyncio.get_running_loop()
+        session, _ = self._sessions.get(loop, (None, None))
+        if session is None or session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.limit,
+                limit_per_host=self.limit_per_host,
+                keepalive_timeout=self.keepalive_timeout,
+                ttl_dns_cache=self.dns_cache_ttl
+            )
+            timeout = aiohttp.ClientTimeout(total=self.timeout, connect=self.connect_timeout)
+            session = aiohttp.ClientSession(connector=connector, timeout=timeout)
+            # the loop finalizes running async generators at shutdown, which closes the session on that loop
+            closer = _close_on_shutdown(session)
+            await closer.__anext__()
+            self._sessions[loop] = (session, closer)
+        return session
+
+    async def close(self) -> None:
+        """Closes the shared session of the running event loop and its pooled connections"""
+        _, closer = self._sessions.pop(asyncio.get_running_loop(), (None, None))
+        if closer is not None:
+            await closer.aclose()
+
+    async def __aenter__(self) -> "AsyncHTTPClient":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+
+
+async def _close_on_shutdown(session: aiohttp.ClientSession):
+    try:
+        yield
+    finally:
+        if not session.closed:
+            await session.close()
+
+
+# shared client used by http_get and http_post unless a session is injected
+http_client = AsyncHTTPClient()
+
+
+async def http_get(
+    endpoint: str,
+    headers: Optional[Dict[str, str]] = None,
+    session: Optional[aiohttp.ClientSession] = None
+) -> Dict[str, Any]:
     """
     Reusable asynchronous HTTP GET requests.
 
     Args:
         endpoint (str): The URL to send the GET request to.
         headers (Optional[Dict[str, str]]): Optional headers to include in the request.
+        session (Optional[aiohttp.ClientSession]): Session to send the request with, defaults to the pooled
+            session of `http_client`.
 
     Returns:
         Dict[str, Any]: A dictionary containing the status code and either the JSON response or response text.
     """
-    async with aiohttp.ClientSession() as session:
-        async with session.get(endpoint, headers=headers) as response:
-            response_data = await response.json() if response.status == 200 else await response.text()
-            return {
-                'status': response.status,
-                'data': response_data
-            }
+    session = session or await http_client.get_session()
+    async with session.get(endpoint, headers=headers) as response:
+        response_data = await response.json() if response.status == 200 else await response.text()
+        return {
+            'status': response.status,
+            'data': response_data
+        }
 
 
-async def http_post(endpoint: str, headers: Optional[Dict[str, str]] = None, payload: Dict[str, Any] = None) -> Dict[str, Any]:
+async def http_post(
+    endpoint: str,
+    headers: Optional[Dict[str, str]] = None,
+    payload: Dict[str, Any] = None,
+    session: Optional[aiohttp.ClientSession] = None
+) -> Dict[str, Any]:
     """
     Reusable asynchronous HTTP POST requests.
 
@@ -31,33 +287,217 @@ async def http_post(endpoint: str, headers: Optional[Dict[str, str]] = None, pay
         endpoint (str): The URL to send the POST request to.
         headers (Optional[Dict[str, str]]): Optional headers to include in the request.
         payload (Optional[Dict[str, Any]]): The data to send in the body of the request.
+        session (Optional[aiohttp.ClientSession]): Session to send the request with, defaults to the pooled
+            session of `http_client`.
 
     Returns:
         Dict[str, Any]: A dictionary containing the status code and either the JSON response or response text.
     """
-    async with aiohttp.ClientSession() as session:
-        async with session.post(endpoint, headers=headers, json=payload) as response:
-            response_data = await response.json() if response.status == 200 else await response.text()
-            return {
-                'status': response.status,
-                'data': response_data
-            }
+    session = session or await http_client.get_session()
+    async with session.post(endpoint, headers=headers, json=payload) as response:
+        response_data = await response.json() if response.status == 200 else await response.text()
+        return {
+            'status': response.status,
+            'data': response_data
+        }
+
+
+class MarkdownTable(NamedTuple):
+    """A rendered markdown table and how many of the result rows it contains"""
+    table: str
+    row_count: Optional[int]
+    rendered_rows: int
+    elided_rows: Optional[int]
 
 
-def json_to_markdown_table(json_data):
+_EMPTY_RESULT_ERROR = (
+    "Invalid JSON data, you may have an error or if the array is empty then it was not possible to resolve "
+    "the query your wrote: {}"
+)
+
+
+def _table_rows(json_data: Any) -> Tuple[List[str], Iterable[Sequence[Any]], Optional[int]]:
+    """Normalizes query results into headers, an iterable of value rows and the row count if known"""
     if isinstance(json_data, str):
         json_data = json.loads(json_data)
+
+    if isinstance(json_data, ColumnarResult):
+        # columnar results are rendered straight from their column vectors
+        if not json_data.row_count:
+            raise ValueError(_EMPTY_RESULT_ERROR.format([]))
+        return list(json_data.columns), json_data.iter_tuples(), json_data.row_count
+
+    if isinstance(json_data, Iterator):
+        # rows streamed as they arrive, such as from query_vds_rows
+        first_row = next(json_data, None)
+        if first_row is None:
+            raise ValueError(_EMPTY_RESULT_ERROR.format([]))
+        headers = list(first_row.keys())
+        rows = ([entry.get(header) for header in headers] for entry in chain([first_row], json_data))
+        return headers, rows, None
+
     # Check if the JSON data is a list and not empty
     if not isinstance(json_data, list) or not json_data:
-        raise ValueError(f"Invalid JSON data, you may have an error or if the array is empty then it was not possible to resolve the query your wrote: {json_data}")
+        raise ValueError(_EMPTY_RESULT_ERROR.format(json_data))
+    headers = list(json_data[0].keys())
+    rows = ([entry.get(header) for header in headers] for entry in json_data)
+    return headers, rows, len(json_data)
+
+
+def _sort_value(value: Any, descending: bool = True) -> Tuple[int, float]:
+    # nulls and non-numeric values rank after every number whichever way rows are sorted
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return (0, 0.0) if descending else (1, 0.0)
+    return (1, number) if descending else (0, number)
+
+
+def _top_rows(rows: Iterable[List[Any]], column: int, k: int, descending: bool) -> Tuple[List[List[Any]], int]:
+    """
+    The `k` rows with the largest (or smallest) values of a column, ranked first, and how many rows were read.
+    Earlier rows win ties, as with `heapq.nlargest`.
+    """
+    heap = []
+    row_count = 0
+    for row in rows:
+        rank = _sort_value(row[column], descending)
+        if not descending:
+            rank = (-rank[0], -rank[1])
+        item = (rank, -row_count, row)
+        row_count += 1
+        if len(heap) < k:
+            heapq.heappush(heap, item)
+        elif k and item[:2] > heap[0][:2]:
+            heapq.heapreplace(heap, item)
+    heap.sort(key=lambda item: item[:2], reverse=True)
+    return [row for _, _, row in heap], row_count
+
 
-    headers = json_data[0].keys()
+def _format_cell(value: Any, max_cell_chars: Optional[int]) -> str:
+    cell = str(value).replace('|', '\\|').replace('\r', ' ').replace('\n', ' ')
+    if max_cell_chars is not None and len(cell) > max_cell_chars:
+        cell = cell[:max(max_cell_chars - 1, 0)] + '…'
+    return cell
 
-    markdown_table = "| " + " | ".join(headers) + " |\n"
-    markdown_table += "| " + " | ".join(['---'] * len(headers)) + " |\n"
 
-    for entry in json_data:
-        row = "| " + " | ".join(str(entry[header]) for header in headers) + " |"
-        markdown_table += row + "\n"
+def render_markdown_table(
+    json_data: Any,
+    max_rows: Optional[int] = None,
+    max_chars: Optional[int] = None,
+    max_cell_chars: Optional[int] = None,
+    sample: str = "head",
+    sort_by: Optional[str] = None,
+    sort_descending: bool = True,
+    pad_columns: bool = False
+) -> MarkdownTable:
+    """
+    Renders query results as a markdown table in linear time, within optional row and character budgets.
+
+    Args:
+        json_data: Rows as a list of dictionaries (or its JSON string), a `ColumnarResult` or an iterator of
+            row dictionaries such as `query_vds_rows`. Iterators are only read as far as the budgets require
+            when sampling the head.
+        max_rows (Optional[int]): Maximum number of rows to render.
+        max_chars (Optional[int]): Maximum size of the table in characters, rows beyond it are elided.
+        max_cell_chars (Optional[int]): Cells longer than this are truncated with an ellipsis.
+        sample (str): Which rows to keep within `max_rows`: "head", "tail", "head_tail" (first and last rows)
+            or "top_k" (largest values of `sort_by`).
+        sort_by (Optional[str]): Column ranking rows for "top_k" sampling.
+        sort_descending (bool): Keep the largest values of `sort_by` when True, the smallest when False.
+        pad_columns (bool): Pad cells so that every column has the same width.
+
+    Returns:
+        MarkdownTable: The table, the number of result rows when known and how many were rendered and elided.
+    """
+    if sample not in ("head", "tail", "head_tail", "top_k"):
+        raise ValueError(f"Unsupported sampling strategy: {sample}")
+
+    headers, rows, row_count = _table_rows(json_data)
+    consumed_all = True
+
+    if max_rows is None:
+        selected = rows
+    elif sample == "head":
+        selected = list(islice(rows, max_rows))
+        if row_count is None:
+            # peek one row to learn whether anything was left out, without reading the rest of the stream
+            consumed_all = next(iter(rows), None) is None
+    elif sample == "tail":
+        selected = deque(maxlen=max_rows)
+        row_count = 0
+        for row in rows:
+            selected.append(row)
+            row_count += 1
+    elif sample == "head_tail":
+        head = list(islice(rows, (max_rows + 1) // 2))
+        tail = deque(maxlen=max_rows // 2)
+        row_count = len(head)
+        for row in rows:
+            tail.append(row)
+            row_count += 1
+        selected = head + list(tail)
+    else:
+        if sort_by not in headers:
+            raise ValueError(f"top_k sampling requires sort_by to name one of the columns: {headers}")
+        selected, row_count = _top_rows(rows, headers.index(sort_by), max_rows, sort_descending)
+
+    header_cells = [_format_cell(header, max_cell_chars) for header in headers]
+    body = []
+    # each row costs its cells, the separators and a newline, the header and divider rows come first
+    size = sum(len(cell) for cell in header_cells) + 9 * len(header_cells) + 4
+    for row in selected:
+        cells = [_format_cell(value, max_cell_chars) for value in row]
+        size += sum(len(cell) for cell in cells) + 3 * len(cells) + 2
+        if max_chars is not None and size > max_chars:
+            consumed_all = False
+            break
+        body.append(cells)
 
-    return markdown_table
+    if row_count is None and consumed_all:
+        row_count = len(body)
+
+    # the note of left out rows counts toward max_chars, rows are dropped until it fits
+    while True:
+        rendered_rows = len(body)
+        elided_rows = row_count - rendered_rows if row_count is not None else None
+        if elided_rows:
+            note = f"\n_{elided_rows} of {row_count} rows not shown_"
+        elif elided_rows is None:
+            note = f"\n_Only the first {rendered_rows} rows are shown_"
+        else:
+            note = ""
+        if not note or max_chars is None or not body or size + len(note) + 1 <= max_chars:
+            break
+        cells = body.pop()
+        size -= sum(len(cell) for cell in cells) + 3 * len(cells) + 2
+
+    if pad_columns:
+        widths = [max(3, len(cell)) for cell in header_cells]
+        for cells in body:
+            for index, cell in enumerate(cells):
+                widths[index] = max(widths[index], len(cell))
+        header_cells = [cell.ljust(width) for cell, width in zip(header_cells, widths)]
+        body = [[cell.ljust(width) for cell, width in zip(cells, widths)] for cells in body]
+        divider = ['-' * width for width in widths]
+    else:
+        divider = ['---'] * len(headers)
+
+    lines = ["| " + " | ".join(header_cells) + " |", "| " + " | ".join(divider) + " |"]
+    lines.extend("| " + " | ".join(cells) + " |" for cells in body)
+    if note:
+        lines.append(note)
+
+    return MarkdownTable(
+        table="\n".join(lines) + "\n",
+        row_count=row_count,
+        rendered_rows=rendered_rows,
+        elided_rows=elided_rows
+    )
+
+
+def json_to_markdown_table(json_data, **budgets):
+    """
+    Renders query results as a markdown table, see `render_markdown_table` for the optional budgets.
+    """
+    return render_markdown_table(json_data, **budgets).table
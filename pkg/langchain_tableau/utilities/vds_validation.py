@@ -0,0 +1,262 @@
+from datetime import date
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+
+# aggregations that only apply to numbers, and date parts and truncations that only apply to dates
+NUMERIC_FUNCTIONS = {"SUM", "AVG", "MEDIAN", "STDEV", "VAR"}
+DATE_FUNCTIONS = {
+    "YEAR", "QUARTER", "MONTH", "WEEK", "DAY",
+    "TRUNC_YEAR", "TRUNC_QUARTER", "TRUNC_MONTH", "TRUNC_WEEK", "TRUNC_DAY"
+}
+NUMERIC_TYPES = {"INTEGER", "REAL"}
+DATE_TYPES = {"DATE", "DATETIME"}
+
+# min and max properties required by each quantitativeFilterType, per filter type
+QUANTITATIVE_BOUNDS = {
+    "QUANTITATIVE_NUMERICAL": ("min", "max"),
+    "QUANTITATIVE_DATE": ("minDate", "maxDate")
+}
+
+
+class VDSValidationError(ValueError):
+    """Raised when a VDS query is rejected locally, before it is sent to VizQL Data Service"""
+
+    def __init__(self, errors: List[str]):
+        self.errors = errors
+        super().__init__("Invalid VDS query. " + " ".join(errors))
+
+
+def _ref_name(ref: str) -> str:
+    return ref.rsplit('/', 1)[-1]
+
+
+def _required(spec: Dict[str, Any]) -> Set[str]:
+    # tolerates a list entry holding several comma separated names
+    return {name.strip() for entry in spec.get('required', []) for name in entry.split(',')}
+
+
+class VDSQueryValidator:
+    """
+    Checks VDS queries against the VDS schema and a datasource's data model without a network round trip.
+
+    The schema (`vds_schema` in `tools/prompts.py`) is compiled once into the properties, required properties
+    and enumerations of fields and of every filter type. Queries are then checked for unknown or missing
+    properties, invalid values, fields missing from the data model, aggregations that do not apply to a
+    field's data type and incomplete quantitative, relative date and match filters.
+
+    Error messages follow the "Error at 'query.filters.0.filterType': ..." format of VDS, so that they can be
+    used to correct the query just like errors returned by the service.
+
+    Args:
+        schema (Dict[str, Any]): Schemas of the VDS OpenAPI specification, keyed by name.
+    """
+
+    def __init__(self, schema: Dict[str, Any]):
+        self.functions = set(schema['Function']['enum'])
+        self.sort_directions = set(schema['SortDirection']['enum'])
+        self.query_properties = set(schema['Query']['properties'])
+        self.field_properties = self._one_of_properties(schema['Field'])
+        self.filter_field_properties = self._one_of_properties(schema['FilterField'])
+        mapping = schema['Filter']['discriminator']['mapping']
+        self.filter_types: Dict[str, Tuple[Set[str], Dict[str, Any]]] = {
+            filter_type: self._resolve(schema, _ref_name(ref)) for filter_type, ref in mapping.items()
+        }
+
+    @staticmethod
+    def _one_of_properties(spec: Dict[str, Any]) -> Set[str]:
+        return {name for option in spec['oneOf'] for name in option.get('properties', {})}
+
+    def _resolve(self, schema: Dict[str, Any], name: str) -> Tuple[Set[str], Dict[str, Any]]:
+        """Merges the required properties and property specs of a schema and the schemas it extends"""
+        spec = schema[name]
+        required, properties = set(), {}
+        for part in spec.get('allOf', []) + [spec]:
+            if '$ref' in part:
+                part_required, part_properties = self._resolve(schema, _ref_name(part['$ref']))
+            else:
+                part_required, part_properties = _required(part), part.get('properties', {})
+            required |= part_required
+            properties.update(part_properties)
+        return required, properties
+
+    def validate(self, query: Any, data_model: Optional[List[Dict[str, Any]]] = None) -> None:
+        """
+        Raises `VDSValidationError` listing every problem found in the query. Fields are only checked against
+        the data model when one is provided.
+        """
+        errors = self.errors(query, data_model)
+        if errors:
+            raise VDSValidationError(errors)
+
+    def errors(self, query: Any, data_model: Optional[List[Dict[str, Any]]] = None) -> List[str]:
+        field_types = None
+        if data_model is not None:
+            field_types = {field.get('fieldCaption'): field.get('dataType') for field in data_model}
+
+        if not isinstance(query, dict):
+            return ["Error at 'query': The query must be a JSON object"]
+
+        errors = [
+            f"Error at 'query': Additional property '{name}' is not allowed"
+            for name in query if name not in self.query_properties
+        ]
+
+        fields = query.get('fields')
+        if not isinstance(fields, list) or not fields:
+            errors.append("Error at 'query.fields': At least one field is required")
+            fields = []
+        for index, field in enumerate(fields):
+            errors.extend(self._field_errors(f"query.fields.{index}", field, field_types))
+
+        filters = query.get('filters', [])
+        if not isinstance(filters, list):
+            errors.append("Error at 'query.filters': Filters must be an array")
+            filters = []
+        filtered = set()
+        for index, query_filter in enumerate(filters):
+            path = f"query.filters.{index}"
+            errors.extend(self._filter_errors(path, query_filter, field_types))
+            if isinstance(query_filter, dict) and isinstance(query_filter.get('field'), dict):
+                target = (query_filter['field'].get('fieldCaption'), query_filter['field'].get('function'))
+                if target in filtered:
+                    errors.append(
+                        f"Error at '{path}': Cannot have multiple Filters for the same Field, or the same Field "
+                        f"with the same function"
+                    )
+                filtered.add(target)
+
+        return errors
+
+    def _field_errors(self, path: str, field: Any, field_types: Optional[Dict[str, str]]) -> List[str]:
+        if not isinstance(field, dict):
+            return [f"Error at '{path}': A field must be a JSON object"]
+        errors = [
+            f"Error at '{path}': Additional property '{name}' is not allowed"
+            for name in field if name not in self.field_properties
+        ]
+        if not field.get('fieldCaption'):
+            errors.append(f"Error at '{path}': Missing required property 'fieldCaption'")
+        if 'function' in field and 'calculation' in field:
+            errors.append(f"Error at '{path}': A field cannot have both a function and a calculation")
+        if 'sortDirection' in field and field['sortDirection'] not in self.sort_directions:
+            errors.append(f"Error at '{path}.sortDirection': Value '{field['sortDirection']}' is not defined in the schema")
+        if 'sortPriority' in field and not (_is_integer(field['sortPriority']) and field['sortPriority'] > 0):
+            errors.append(f"Error at '{path}.sortPriority': sortPriority must be an integer greater than 0")
+        if 'maxDecimalPlaces' in field and not (_is_integer(field['maxDecimalPlaces']) and field['maxDecimalPlaces'] >= 0):
+            errors.append(f"Error at '{path}.maxDecimalPlaces': maxDecimalPlaces must be an integer of at least 0")
+        if 'calculation' not in field:
+            errors.extend(self._data_model_errors(path, field, field_types))
+        return errors
+
+    def _filter_field_errors(self, path: str, field: Any, field_types: Optional[Dict[str, str]]) -> List[str]:
+        if not isinstance(field, dict):
+            return [f"Error at '{path}': A filter field must be a JSON object"]
+        errors = [
+            f"Error at '{path}': Additional property '{name}' is not allowed"
+            for name in field if name not in self.filter_field_properties
+        ]
+        if 'calculation' in field:
+            if 'fieldCaption' in field or 'function' in field:
+                errors.append(f"Error at '{path}': A calculation cannot be combined with a fieldCaption or function")
+            return errors
+        if not field.get('fieldCaption'):
+            errors.append(f"Error at '{path}': Missing required property 'fieldCaption'")
+        errors.extend(self._data_model_errors(path, field, field_types))
+        return errors
+
+    def _data_model_errors(self, path: str, field: Dict[str, Any], field_types: Optional[Dict[str, str]]) -> List[str]:
+        caption, function = field.get('fieldCaption'), field.get('function')
+        if function is not None and function not in self.functions:
+            return [f"Error at '{path}.function': Value '{function}' is not defined in the schema"]
+        if field_types is None or not caption:
+            return []
+        if caption not in field_types:
+            return [f"Error at '{path}.fieldCaption': Field '{caption}' is not in the data model of the data source"]
+        data_type = field_types[caption]
+        if function in NUMERIC_FUNCTIONS and data_type not in NUMERIC_TYPES | {"UNKNOWN", None}:
+            return [f"Error at '{path}.function': {function} cannot aggregate '{caption}' of type {data_type}"]
+        if function in DATE_FUNCTIONS and data_type not in DATE_TYPES | {"UNKNOWN", None}:
+            return [f"Error at '{path}.function': {function} only applies to dates, '{caption}' is of type {data_type}"]
+        return []
+
+    def _filter_errors(self, path: str, query_filter: Any, field_types: Optional[Dict[str, str]]) -> List[str]:
+        if not isinstance(query_filter, dict):
+            return [f"Error at '{path}': A filter must be a JSON object"]
+        filter_type = query_filter.get('filterType')
+        if filter_type is None:
+            return [f"Error at '{path}': Missing required property 'filterType'"]
+        if filter_type not in self.filter_types:
+            return [f"Error at '{path}.filterType': Value '{filter_type}' is not defined in the schema"]
+
+        required, properties = self.filter_types[filter_type]
+        errors = [
+            f"Error at '{path}': Missing required property '{name}'"
+            for name in sorted(required) if name not in query_filter
+        ]
+        for name, value in query_filter.items():
+            spec = properties.get(name)
+            if spec is None:
+                errors.append(f"Error at '{path}': Additional property '{name}' is not allowed for {filter_type} filters")
+            elif 'enum' in spec and value not in spec['enum']:
+                errors.append(f"Error at '{path}.{name}': Value '{value}' is not defined in the schema")
+            elif spec.get('type') == 'integer' and not _is_integer(value):
+                errors.append(f"Error at '{path}.{name}': Value must be an integer")
+            elif spec.get('type') == 'number' and not _is_number(value):
+                errors.append(f"Error at '{path}.{name}': Value must be a number")
+            elif spec.get('format') == 'date' and not _is_date(value):
+                errors.append(f"Error at '{path}.{name}': Value '{value}' is not an RFC 3339 date (YYYY-MM-DD)")
+
+        if 'field' in query_filter:
+            errors.extend(self._filter_field_errors(f"{path}.field", query_filter['field'], field_types))
+        if 'fieldToMeasure' in query_filter:
+            errors.extend(self._filter_field_errors(f"{path}.fieldToMeasure", query_filter['fieldToMeasure'], field_types))
+
+        if filter_type in QUANTITATIVE_BOUNDS:
+            lower, upper = QUANTITATIVE_BOUNDS[filter_type]
+            needed = {"RANGE": (lower, upper), "MIN": (lower,), "MAX": (upper,)}.get(
+                query_filter.get('quantitativeFilterType'), ()
+            )
+            errors.extend(
+                f"Error at '{path}': quantitativeFilterType {query_filter['quantitativeFilterType']} requires '{name}'"
+                for name in needed if name not in query_filter
+            )
+        if filter_type == "DATE" and query_filter.get('dateRangeType') in ("LASTN", "NEXTN") and 'rangeN' not in query_filter:
+            errors.append(f"Error at '{path}': dateRangeType {query_filter['dateRangeType']} requires 'rangeN'")
+        if filter_type == "MATCH" and not any(name in query_filter for name in ("contains", "startsWith", "endsWith")):
+            errors.append(f"Error at '{path}': MATCH filters require one of 'contains', 'startsWith' or 'endsWith'")
+        if filter_type == "SET" and 'values' in query_filter and not isinstance(query_filter['values'], list):
+            errors.append(f"Error at '{path}.values': Values must be an array")
+
+        errors.extend(self._filter_type_errors(path, filter_type, query_filter.get('field'), field_types))
+        return errors
+
+    def _filter_type_errors(self, path: str, filter_type: str, field: Any, field_types: Optional[Dict[str, str]]) -> List[str]:
+        """Checks that date and numerical filters target fields of a matching data type"""
+        if field_types is None or not isinstance(field, dict) or field.get('fieldCaption') not in field_types:
+            return []
+        caption, data_type = field['fieldCaption'], field_types[field['fieldCaption']]
+        if data_type in ("UNKNOWN", None) or field.get('function') is not None:
+            return []
+        if filter_type in ("QUANTITATIVE_DATE", "DATE") and data_type not in DATE_TYPES:
+            return [f"Error at '{path}.field': {filter_type} filters apply to dates, '{caption}' is of type {data_type}"]
+        if filter_type == "QUANTITATIVE_NUMERICAL" and data_type not in NUMERIC_TYPES:
+            return [f"Error at '{path}.field': {filter_type} filters apply to numbers, '{caption}' is of type {data_type}"]
+        return []
+
+
+def _is_integer(value: Any) -> bool:
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _is_date(value: Any) -> bool:
+    if not isinstance(value, str):
+        return False
+    try:
+        date.fromisoformat(value[:10])
+    except ValueError:
+        return False
+    return len(value) == 10 or value[10] in "T "
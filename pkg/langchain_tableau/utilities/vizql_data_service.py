@@ -1,8 +1,80 @@
-from typing import Dict, Any
-import requests
+import codecs
+import json
+import re
+from typing import Dict, Any, AsyncIterator, Iterable, Iterator, List, Optional
 
+from langchain_tableau.utilities.utils import http_client, http_post, http_session_pool
+from langchain_tableau.utilities.columnar import ColumnarBuilder
+from langchain_tableau.utilities.cache import AsyncSingleFlight, SingleFlight, VDSResponseCache, vds_query_key
+
+
+# size of the chunks read off the socket when streaming query responses
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# concurrent identical queries share one outstanding request
+vds_single_flight = SingleFlight()
+vds_async_single_flight = AsyncSingleFlight()
+
+
+def query_vds(
+    api_key: str,
+    datasource_luid: str,
+    url: str,
+    query: Dict[str, Any],
+    cache: Optional[VDSResponseCache] = None,
+    user_scope: Optional[str] = None,
+    version: Optional[str] = None,
+    result_format: str = "rows"
+) -> Dict[str, Any]:
+    """
+    Queries a published datasource with VizQL Data Service.
+
+    When a `cache` is provided, identical queries by the same `user_scope` (such as site and user) are served
+    from it while the datasource `version` (see `metadata.datasource_version`) is unchanged.
+
+    With `result_format="columns"` the response 'data' is a `ColumnarResult` decoded straight into column
+    lists instead of a list of row dictionaries, which uses far less memory on large or wide results.
+    """
+    if result_format not in ("rows", "columns"):
+        raise ValueError(f"Unsupported VDS result format: {result_format}")
+
+    if cache is not None:
+        cache_key = cache.cache_key(datasource_luid, query, user_scope, result_format)
+        cached_response = cache.get(cache_key, version=version)
+        if cached_response is not None:
+            return cached_response
+
+    def fetch() -> Dict[str, Any]:
+        response_json = _post_vds_query(
+            api_key=api_key,
+            datasource_luid=datasource_luid,
+            url=url,
+            query=query,
+            result_format=result_format
+        )
+        if cache is not None:
+            cache.set(cache_key, response_json, datasource_luid=datasource_luid, version=version)
+        return response_json
+
+    # without a user scope, only callers holding the same session may share a result
+    flight_key = vds_query_key(datasource_luid, query, user_scope or api_key, result_format)
+    return vds_single_flight.do(flight_key, fetch)
+
+
+def _post_vds_query(
+    api_key: str,
+    datasource_luid: str,
+    url: str,
+    query: Dict[str, Any],
+    result_format: str = "rows"
+) -> Dict[str, Any]:
+    if result_format == "columns":
+        # columns are filled while rows are parsed off the socket, the body is never buffered whole
+        builder = ColumnarBuilder()
+        for row in query_vds_rows(api_key=api_key, datasource_luid=datasource_luid, url=url, query=query):
+            builder.append(row.items())
+        return {'data': builder.result()}
 
-def query_vds(api_key: str, datasource_luid: str, url: str, query: Dict[str, Any]) -> Dict[str, Any]:
     full_url = f"{url}/api/v1/vizql-data-service/query-datasource"
 
     payload = {
@@ -17,7 +89,7 @@ def query_vds(api_key: str, datasource_luid: str, url: str, query: Dict[str, Any
         'Content-Type': 'application/json'
     }
 
-    response = requests.post(full_url, headers=headers, json=payload)
+    response = http_session_pool.post(full_url, headers=headers, json=payload)
 
     if response.status_code == 200:
         return response.json()
@@ -29,6 +101,234 @@ def query_vds(api_key: str, datasource_luid: str, url: str, query: Dict[str, Any
         raise RuntimeError(error_message)
 
 
+def query_vds_rows(
+    api_key: str,
+    datasource_luid: str,
+    url: str,
+    query: Dict[str, Any],
+    chunk_size: int = STREAM_CHUNK_SIZE
+) -> Iterator[Dict[str, Any]]:
+    """
+    Streams the rows of a VizQL Data Service query as they are read off the socket.
+
+    Rows are parsed incrementally, so peak memory stays around one chunk and one row regardless of the
+    result size. Closing the generator early (for example when only the first rows are needed) closes the
+    connection without downloading the rest of the response.
+    """
+    full_url = f"{url}/api/v1/vizql-data-service/query-datasource"
+
+    payload = {
+        "datasource": {
+            "datasourceLuid": datasource_luid
+        },
+        "query": query
+    }
+
+    headers = {
+        'X-Tableau-Auth': api_key,
+        'Content-Type': 'application/json'
+    }
+
+    response = http_session_pool.post(full_url, headers=headers, json=payload, stream=True)
+
+    try:
+        if response.status_code != 200:
+            error_message = (
+                f"Failed to query data source via Tableau VizQL Data Service. "
+                f"Status code: {response.status_code}. Response: {response.text}"
+            )
+            raise RuntimeError(error_message)
+
+        yield from iter_vds_rows(response.iter_content(chunk_size=chunk_size))
+    finally:
+        response.close()
+
+
+async def query_vds_rows_async(
+    api_key: str,
+    datasource_luid: str,
+    url: str,
+    query: Dict[str, Any],
+    chunk_size: int = STREAM_CHUNK_SIZE
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Asynchronous version of `query_vds_rows`.
+    """
+    full_url = f"{url}/api/v1/vizql-data-service/query-datasource"
+
+    payload = {
+        "datasource": {
+            "datasourceLuid": datasource_luid
+        },
+        "query": query
+    }
+
+    headers = {
+        'X-Tableau-Auth': api_key,
+        'Content-Type': 'application/json'
+    }
+
+    session = await http_client.get_session()
+    async with session.post(full_url, headers=headers, json=payload) as response:
+        if response.status != 200:
+            error_message = (
+                f"Failed to query data source via Tableau VizQL Data Service. "
+                f"Status code: {response.status}. Response: {await response.text()}"
+            )
+            raise RuntimeError(error_message)
+
+        parser = VDSRowParser()
+        async for chunk in response.content.iter_chunked(chunk_size):
+            for row in parser.feed(chunk):
+                yield row
+        parser.close()
+
+
+class VDSRowParser:
+    """
+    Incremental parser for VizQL Data Service query responses shaped as {"data": [{...}, {...}]}.
+
+    Chunks of the body are passed to `feed` in order, which returns the rows completed so far. Each row
+    is decoded as soon as its closing brace arrives, so the full body is never held in memory.
+    """
+
+    _data_start = re.compile(r'"data"\s*:\s*\[')
+    _separators = re.compile(r'[\s,]*')
+
+    def __init__(self):
+        self._decoder = json.JSONDecoder()
+        self._text_decoder = codecs.getincrementaldecoder('utf-8')()
+        self._buffer = ''
+        self._in_data = False
+        self._done = False
+
+    def feed(self, chunk: Any) -> List[Dict[str, Any]]:
+        if isinstance(chunk, bytes):
+            chunk = self._text_decoder.decode(chunk)
+        if self._done:
+            return []
+        self._buffer += chunk
+
+        if not self._in_data:
+            match = self._data_start.search(self._buffer)
+            if match is None:
+                # keep enough of the tail to match the array start split across chunks
+                self._buffer = self._buffer[-64:]
+                return []
+            self._buffer = self._buffer[match.end():]
+            self._in_data = True
+
+        rows = []
+        position = 0
+        while True:
+            position = self._separators.match(self._buffer, position).end()
+            if position >= len(self._buffer):
+                break
+            if self._buffer[position] == ']':
+                self._done = True
+                break
+            try:
+                row, position = self._decoder.raw_decode(self._buffer, position)
+            except json.JSONDecodeError:
+                # the row is incomplete, wait for the next chunk
+                break
+            rows.append(row)
+
+        self._buffer = '' if self._done else self._buffer[position:]
+        return rows
+
+    def close(self) -> None:
+        """Checks that the response ended with a complete data array"""
+        self.feed(self._text_decoder.decode(b'', final=True))
+        if not self._done and (self._in_data or self._buffer.strip()):
+            raise ValueError("Incomplete or malformed VizQL Data Service response")
+
+
+def iter_vds_rows(chunks: Iterable[Any]) -> Iterator[Dict[str, Any]]:
+    """Yields the rows of a VDS query response from an iterable of body chunks (bytes or str)"""
+    parser = VDSRowParser()
+    for chunk in chunks:
+        yield from parser.feed(chunk)
+    parser.close()
+
+
+async def query_vds_async(
+    api_key: str,
+    datasource_luid: str,
+    url: str,
+    query: Dict[str, Any],
+    cache: Optional[VDSResponseCache] = None,
+    user_scope: Optional[str] = None,
+    version: Optional[str] = None,
+    result_format: str = "rows"
+) -> Dict[str, Any]:
+    """
+    Asynchronous version of `query_vds`.
+    """
+    if result_format not in ("rows", "columns"):
+        raise ValueError(f"Unsupported VDS result format: {result_format}")
+
+    if cache is not None:
+        cache_key = cache.cache_key(datasource_luid, query, user_scope, result_format)
+        cached_response = cache.get(cache_key, version=version)
+        if cached_response is not None:
+            return cached_response
+
+    async def fetch() -> Dict[str, Any]:
+        response_json = await _post_vds_query_async(
+            api_key=api_key,
+            datasource_luid=datasource_luid,
+            url=url,
+            query=query,
+            result_format=result_format
+        )
+        if cache is not None:
+            cache.set(cache_key, response_json, datasource_luid=datasource_luid, version=version)
+        return response_json
+
+    flight_key = vds_query_key(datasource_luid, query, user_scope or api_key, result_format)
+    return await vds_async_single_flight.do(flight_key, fetch)
+
+
+async def _post_vds_query_async(
+    api_key: str,
+    datasource_luid: str,
+    url: str,
+    query: Dict[str, Any],
+    result_format: str = "rows"
+) -> Dict[str, Any]:
+    if result_format == "columns":
+        builder = ColumnarBuilder()
+        async for row in query_vds_rows_async(api_key=api_key, datasource_luid=datasource_luid, url=url, query=query):
+            builder.append(row.items())
+        return {'data': builder.result()}
+
+    full_url = f"{url}/api/v1/vizql-data-service/query-datasource"
+
+    payload = {
+        "datasource": {
+            "datasourceLuid": datasource_luid
+        },
+        "query": query
+    }
+
+    headers = {
+        'X-Tableau-Auth': api_key,
+        'Content-Type': 'application/json'
+    }
+
+    response = await http_post(endpoint=full_url, headers=headers, payload=payload)
+
+    if response['status'] == 200:
+        return response['data']
+    else:
+        error_message = (
+            f"Failed to query data source via Tableau VizQL Data Service. "
+            f"Status code: {response['status']}. Response: {response['data']}"
+        )
+        raise RuntimeError(error_message)
+
+
 def query_vds_metadata(api_key: str, datasource_luid: str, url: str) -> Dict[str, Any]:
     full_url = f"{url}/api/v1/vizql-data-service/read-metadata"
 
@@ -43,7 +343,7 @@ def query_vds_metadata(api_key: str, datasource_luid: str, url: str) -> Dict[str
         'Content-Type': 'application/json'
     }
 
-    response = requests.post(full_url, headers=headers, json=payload)
+    response = http_session_pool.post(full_url, headers=headers, json=payload, retry=True)
 
     if response.status_code == 200:
         return response.json()
@@ -53,3 +353,29 @@ def query_vds_metadata(api_key: str, datasource_luid: str, url: str) -> Dict[str
             f"Status code: {response.status_code}. Response: {response.text}"
         )
         raise RuntimeError(error_message)
+
+
+async def query_vds_metadata_async(api_key: str, datasource_luid: str, url: str) -> Dict[str, Any]:
+    full_url = f"{url}/api/v1/vizql-data-service/read-metadata"
+
+    payload = {
+        "datasource": {
+            "datasourceLuid": datasource_luid
+        }
+    }
+
+    headers = {
+        'X-Tableau-Auth': api_key,
+        'Content-Type': 'application/json'
+    }
+
+    response = await http_post(endpoint=full_url, headers=headers, payload=payload)
+
+    if response['status'] == 200:
+        return response['data']
+    else:
+        error_message = (
+            f"Failed to obtain data source metadata from VizQL Data Service. "
+            f"Status code: {response['status']}. Response: {response['data']}"
+        )
+        raise RuntimeError(error_message)